@@ -0,0 +1,49 @@
+"""Time ``ics_builder.build_events`` on a synthetic timetable.
+
+Usage::
+
+    python benchmarks/bench_build_events.py [--activities 10000] [--repeat 3]
+
+Run it on two checkouts to compare; only public APIs are used. See
+``bench_stages.py`` for the whole pipeline.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from hw_timetable import ics_builder, models, synthetic  # noqa: E402
+from hw_timetable.util import parse_timezone  # noqa: E402
+
+
+def synthetic_activities(count: int, seed: int = 0) -> list[models.Activity]:
+    rows = synthetic.activities(count, locations=2, seed=seed)
+    return [models.Activity.model_validate(row) for row in rows]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--activities", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    activities = synthetic_activities(args.activities)
+    tz = parse_timezone("Europe/London")
+    best = float("inf")
+    for _ in range(args.repeat):
+        began = time.perf_counter()
+        events = ics_builder.build_events(activities, tz=tz)
+        best = min(best, time.perf_counter() - began)
+    print(
+        f"build_events: {args.activities} activities -> {len(events)} events "
+        f"in {best * 1000:.1f} ms (best of {args.repeat})"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Time each stage of the export pipeline on a synthetic timetable.
+
+Usage::
+
+    python benchmarks/bench_stages.py [--activities 10000] [--repeat 5]
+        [--output results.json] [--compare baseline.json [--threshold 1.2]]
+
+Stages are timed separately: ``json_decode``, ``model_validate``,
+``build_events``, ``build_blocked_events`` and ``serialize`` (content lines
+plus ``_format_lines`` folding). Results are written as JSON so runs on two
+commits can be compared; ``--compare`` prints the ratio per stage and exits
+non-zero if any stage is slower than ``--threshold`` times the baseline.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from hw_timetable import ics_builder, models, synthetic  # noqa: E402
+from hw_timetable.util import parse_timezone  # noqa: E402
+
+ACTIVITIES = "/activity/activities"
+BLOCKED = "/activity/blocked-out-periods"
+
+
+def _commit() -> str | None:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def _time(fn: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    runs: List[float] = []
+    for _ in range(repeat):
+        began = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - began)
+    return {
+        "best_s": min(runs),
+        "median_s": statistics.median(runs),
+        "runs_s": runs,
+    }
+
+
+def run_stages(config: Dict[str, Any], repeat: int) -> Dict[str, Dict[str, Any]]:
+    bodies = synthetic.payloads(
+        config["activities"],
+        blocked=config["blocked"],
+        weeks=config["weeks"],
+        weeks_per_activity=config["weeks_per_activity"],
+        locations=config["locations"],
+        instructors=config["instructors"],
+        seed=config["seed"],
+    )
+    tz = parse_timezone("Europe/London")
+    # Each stage is fed the previous stage's output, computed once up front.
+    activities = models.parse_activities(bodies[ACTIVITIES])
+    blocked = [
+        models.BlockedPeriod.model_validate(b) for b in json.loads(bodies[BLOCKED])
+    ]
+    events = ics_builder.build_events(activities, tz=tz)
+    events += ics_builder.build_blocked_events(blocked, tz=tz)
+    programme_info = synthetic.programme_info()
+
+    stages = {
+        "json_decode": lambda: json.loads(bodies[ACTIVITIES]),
+        "model_validate": lambda: models.parse_activities(bodies[ACTIVITIES]),
+        "build_events": lambda: ics_builder.build_events(activities, tz=tz),
+        "build_blocked_events": lambda: ics_builder.build_blocked_events(
+            blocked, tz=tz
+        ),
+        "serialize": lambda: ics_builder._format_lines(
+            ics_builder.iter_ics_lines(programme_info, events, reproducible=True)
+        ),
+    }
+    results = {name: _time(fn, repeat) for name, fn in stages.items()}
+    results["json_decode"]["bytes"] = len(bodies[ACTIVITIES])
+    results["build_events"]["events"] = len(events) - len(blocked)
+    results["serialize"]["bytes"] = len(
+        ics_builder._format_lines(
+            ics_builder.iter_ics_lines(programme_info, events, reproducible=True)
+        ).encode("utf-8")
+    )
+    return results
+
+
+def compare(
+    results: Dict[str, Any], baseline: Dict[str, Any], threshold: float
+) -> bool:
+    ok = True
+    print(f"{'stage':<22}{'baseline ms':>13}{'current ms':>12}{'ratio':>8}")
+    for name, stage in results["stages"].items():
+        before = baseline.get("stages", {}).get(name)
+        if not before:
+            print(f"{name:<22}{'-':>13}{stage['best_s'] * 1000:>12.1f}")
+            continue
+        ratio = stage["best_s"] / before["best_s"]
+        flag = " SLOWER" if ratio > threshold else ""
+        ok = ok and not flag
+        print(
+            f"{name:<22}{before['best_s'] * 1000:>13.1f}"
+            f"{stage['best_s'] * 1000:>12.1f}{ratio:>8.2f}{flag}"
+        )
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--activities", type=int, default=10_000)
+    parser.add_argument("--blocked", type=int, default=200)
+    parser.add_argument("--weeks", type=int, default=12)
+    parser.add_argument("--weeks-per-activity", type=int, default=10)
+    parser.add_argument("--locations", type=int, default=1)
+    parser.add_argument("--instructors", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Write the results JSON to this path")
+    parser.add_argument("--compare", help="Baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=1.2)
+    args = parser.parse_args()
+
+    config = {
+        "activities": args.activities,
+        "blocked": args.blocked,
+        "weeks": args.weeks,
+        "weeks_per_activity": args.weeks_per_activity,
+        "locations": args.locations,
+        "instructors": args.instructors,
+        "seed": args.seed,
+    }
+    results = {
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "config": config,
+        "stages": run_stages(config, args.repeat),
+    }
+    text = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        if baseline.get("config") != config:
+            print("warning: baseline was run with a different config", file=sys.stderr)
+        if not compare(results, baseline, args.threshold):
+            raise SystemExit(1)
+    elif not args.output:
+        print(text)
+    else:
+        for name, stage in results["stages"].items():
+            print(f"{name:<22}{stage['best_s'] * 1000:>10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,3 @@
 """HW Timetable exporter package."""
 
-__all__ = ["auth", "api", "ics_builder", "models", "util"]
+__all__ = ["auth", "api", "batch", "cache", "ics_builder", "models", "util"]
@@ -4,15 +4,9 @@ from __future__ import annotations
 
 import json
 import logging
-import time
+import threading
 from pathlib import Path
-from typing import Any
-
-try:
-    import requests
-except ModuleNotFoundError:  # pragma: no cover - requests may be missing in tests
-    requests = None
-
+from typing import Any, Dict, Iterable
 
 BASE_URL = "https://timetableexplorer-api.hw.ac.uk"
 ENDPOINTS = [
@@ -24,6 +18,16 @@ ENDPOINTS = [
 ]
 
 
+def _requests() -> Any:
+    """Import ``requests`` on first use; offline runs never need it."""
+
+    try:
+        import requests
+    except ModuleNotFoundError:  # pragma: no cover - requests may be missing
+        return None
+    return requests
+
+
 class APIClient:
     def __init__(
         self,
@@ -31,46 +35,241 @@ class APIClient:
         *,
         dump_json: bool = False,
         offline: bool = False,
+        use_cache: bool = True,
+        cache_ttl: float | None = None,
+        session: Any = None,
+        refresh_token: bool = True,
+        token_profile: str | None = "default",
+        out_dir: Path = Path("out"),
+        cache_dir: Path | None = None,
+        memo: Any = None,
+        retry: Any = None,
     ) -> None:
         self.token = token
         self.dump_json = dump_json
         self.offline = offline
-        self.session = requests.Session() if requests else None
-        self.json_dir = Path("out/json")
-        self.json_dir.mkdir(parents=True, exist_ok=True)
+        self.refresh_token = refresh_token
+        self.token_profile = token_profile
+        # An optional cache.ResponseMemo, typically shared by every client in
+        # the process, that coalesces concurrent fetches of one response.
+        self.memo = memo
+        if retry is None:
+            from .retry import RetryPolicy
+
+            retry = RetryPolicy()
+        self.retry = retry
+        if session is None and not offline:
+            requests = _requests()
+            session = requests.Session() if requests else None
+        self.session = session
+        self.json_dir = out_dir / "json"
+        self.cache = None
+        if use_cache and not offline:
+            from . import cache
+
+            cache_dir = out_dir / "cache" if cache_dir is None else cache_dir
+            self.cache = cache.ResponseCache(
+                cache_dir / cache.namespace(token, token_profile), ttl=cache_ttl
+            )
+        self._token_lock = threading.Lock()
 
     def _json_path(self, endpoint: str) -> Path:
         name = endpoint.strip("/").replace("/", "_") + ".json"
         return self.json_dir / name
 
+    def _refresh_token(self, stale: str | None) -> bool:
+        """Swap in a newer token; False if nothing newer is available."""
+
+        with self._token_lock:
+            # Another worker may already have refreshed while we waited.
+            if self.token != stale:
+                return True
+            logging.info("Token expired, refreshing")
+            from . import auth  # local import to avoid hard dependency
+
+            token = auth.acquire_token(
+                profile=self.token_profile or auth.DEFAULT_PROFILE
+            )
+            if token == stale:
+                return False
+            self.token = token
+            return True
+
+    def _check_token(self, endpoint: str) -> None:
+        """Fail before sending a request with a token known to have expired."""
+
+        token = self.token
+        if not token:
+            return
+        from . import auth
+
+        if not auth.is_expired(token):
+            return
+        if not self.refresh_token or not self._refresh_token(token):
+            auth.check_token(token, f"token for {endpoint}")
+
     def get(self, endpoint: str) -> Any:
+        return json.loads(self.get_bytes(endpoint))
+
+    def get_bytes(self, endpoint: str) -> bytes:
+        """Return the raw JSON body for ``endpoint``.
+
+        Cached bodies are served without a request while their TTL holds and
+        are otherwise revalidated with ``If-None-Match``/``If-Modified-Since``.
+        With a ``memo``, concurrent identical requests share one fetch.
+        """
+
         if self.offline:
-            with self._json_path(endpoint).open("r", encoding="utf-8") as f:
-                return json.load(f)
+            return self._json_path(endpoint).read_bytes()
+        if self.memo is not None:
+            from .cache import namespace
+
+            key = (namespace(self.token, self.token_profile), endpoint)
+            body = self.memo.get(key, lambda: self._fetch(endpoint))
+        else:
+            body = self._fetch(endpoint)
+        return self._dump(endpoint, body)
+
+    def _fetch(self, endpoint: str) -> bytes:
+        cached = self.cache.load(endpoint) if self.cache else None
+        if cached is not None and cached.is_fresh():
+            logging.debug("Serving %s from cache", endpoint)
+            return cached.body
+        requests = _requests()
         if not requests:
             raise RuntimeError("requests is required for network operations")
+        self._check_token(endpoint)
         url = BASE_URL + endpoint
-        headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
-        for attempt in range(4):
+        policy = self.retry
+        deadline = policy.deadline()
+        refreshed = False
+        attempt = 0
+        while True:
+            token = self.token
+            headers = {"Authorization": f"Bearer {token}"} if token else {}
+            if cached is not None:
+                headers.update(cached.conditional_headers())
+            retry_after = None
             try:
-                resp = self.session.get(url, headers=headers, timeout=30)
-                if resp.status_code == 401 and attempt == 0:
-                    logging.info("Token expired, refreshing")
-                    from . import auth  # local import to avoid hard dependency
-
-                    self.token = auth.acquire_token()
-                    headers["Authorization"] = f"Bearer {self.token}"
-                    continue
-                if resp.status_code >= 500:
-                    time.sleep(2**attempt)
-                    continue
-                resp.raise_for_status()
-                data = resp.json()
-                if self.dump_json:
-                    with self._json_path(endpoint).open("w", encoding="utf-8") as f:
-                        json.dump(data, f)
-                return data
+                resp = self.session.get(
+                    url, headers=headers, timeout=policy.request_timeout(deadline)
+                )
             except requests.RequestException as exc:
                 logging.warning("Request error: %s", exc)
-                time.sleep(2**attempt)
-        raise RuntimeError(f"Failed to fetch {endpoint}")
+                error = str(exc)
+            else:
+                if resp.status_code == 401 and (refreshed or not self.refresh_token):
+                    raise RuntimeError(f"Token rejected fetching {endpoint}")
+                if resp.status_code == 401:
+                    # Retry at once with a newer token; resending the same
+                    # token would only be rejected again.
+                    refreshed = True
+                    if not self._refresh_token(token):
+                        raise RuntimeError(
+                            f"Token rejected fetching {endpoint} and no newer "
+                            "token is available"
+                        )
+                    continue
+                if resp.status_code == 304 and cached is not None:
+                    logging.debug("%s not modified", endpoint)
+                    self.cache.revalidated(endpoint, cached, resp.headers)
+                    return cached.body
+                if resp.status_code not in policy.retry_statuses:
+                    resp.raise_for_status()
+                    body = resp.content
+                    if self.cache:
+                        self.cache.store(endpoint, body, resp.headers)
+                    return body
+                retry_after = resp.headers.get("Retry-After")
+                error = f"HTTP {resp.status_code}"
+            delay = policy.backoff(attempt, retry_after)
+            attempt += 1
+            if attempt >= policy.attempts:
+                break
+            logging.debug("Retrying %s in %.2fs (%s)", endpoint, delay, error)
+            if not policy.wait(delay, deadline):
+                reason = "cancelled" if policy.cancelled else "out of time"
+                raise RuntimeError(f"Failed to fetch {endpoint}: {error} ({reason})")
+        raise RuntimeError(f"Failed to fetch {endpoint}: {error}")
+
+    def _dump(self, endpoint: str, body: bytes) -> bytes:
+        if self.dump_json:
+            from .util import write_if_changed
+
+            write_if_changed(self._json_path(endpoint), body)
+        return body
+
+    def get_many(
+        self,
+        endpoints: Iterable[str],
+        *,
+        max_workers: int | None = None,
+        raw: bool = False,
+    ) -> Dict[str, Any]:
+        """Fetch ``endpoints`` concurrently, keyed by endpoint.
+
+        Each request goes through :meth:`get` (or :meth:`get_bytes` when
+        ``raw`` is set), so the 401-refresh and retry behaviour is unchanged;
+        the requests share this client's session pool.
+        """
+
+        fetch = self.get_bytes if raw else self.get
+        unique = list(dict.fromkeys(endpoints))
+        if self.offline or len(unique) <= 1:
+            return {endpoint: fetch(endpoint) for endpoint in unique}
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=max_workers or len(unique)) as pool:
+            futures = {endpoint: pool.submit(fetch, endpoint) for endpoint in unique}
+            return {endpoint: future.result() for endpoint, future in futures.items()}
+
+
+def pooled_session(pool_size: int) -> Any:
+    """Return a session whose connection pool can serve ``pool_size`` threads."""
+
+    requests = _requests()
+    if not requests:
+        raise RuntimeError("requests is required for network operations")
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class Payloads:
+    """Endpoint payloads that are fetched on first access.
+
+    ``prefetch`` loads a known set of endpoints concurrently up front; anything
+    else is only requested if a caller actually reads it. Bodies are kept as
+    raw bytes and decoded on first item access.
+    """
+
+    def __init__(self, client: APIClient) -> None:
+        self.client = client
+        self._raw: Dict[str, bytes] = {}
+        self._decoded: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def prefetch(self, endpoints: Iterable[str]) -> None:
+        missing = [e for e in dict.fromkeys(endpoints) if e not in self._raw]
+        if missing:
+            self._raw.update(self.client.get_many(missing, raw=True))
+
+    def __contains__(self, endpoint: str) -> bool:
+        return endpoint in self._raw
+
+    def raw(self, endpoint: str) -> bytes:
+        with self._lock:
+            if endpoint not in self._raw:
+                self._raw[endpoint] = self.client.get_bytes(endpoint)
+            return self._raw[endpoint]
+
+    def __getitem__(self, endpoint: str) -> Any:
+        body = self.raw(endpoint)
+        with self._lock:
+            if endpoint not in self._decoded:
+                self._decoded[endpoint] = json.loads(body)
+            return self._decoded[endpoint]
@@ -3,16 +3,36 @@
 The HW timetable API ultimately expects an ``Authorization: Bearer`` header. To
 keep the CLI predictable, we now rely entirely on user-provided tokens rather
 than attempting MSAL device flows.
+
+Tokens are JWTs, so their ``exp`` claim is read locally (without verifying the
+signature) and a token that is known to have expired is rejected before any
+request is sent. Tokens are remembered per named profile in a small JSON
+store together with where they came from and when they expire.
 """
 
 from __future__ import annotations
 
+import base64
+import json
 import logging
 import os
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import util
 
 TOKEN_CACHE_PATH = Path(os.path.expanduser("~/.cache/hw_timetable/token.txt"))
+TOKEN_STORE_PATH = TOKEN_CACHE_PATH.with_name("tokens.json")
+DEFAULT_PROFILE = "default"
+# Treat tokens this close to expiry as expired: they would die mid-run.
+EXPIRY_LEEWAY = 60.0
+
+
+class TokenExpiredError(RuntimeError):
+    """Raised when every available token is known to have expired."""
 
 
 def _normalize_token(value: Optional[str]) -> Optional[str]:
@@ -26,7 +46,148 @@ def _normalize_token(value: Optional[str]) -> Optional[str]:
     return token or None
 
 
+def decode_claims(token: str) -> Dict[str, Any]:
+    """Return the JWT payload of ``token``, or ``{}`` if it is not a JWT.
+
+    The signature is not verified; the claims are only used to avoid sending
+    requests that are bound to fail.
+    """
+
+    parts = token.split(".")
+    if len(parts) != 3:
+        return {}
+    payload = parts[1] + "=" * (-len(parts[1]) % 4)
+    try:
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+    except (ValueError, TypeError):
+        return {}
+    return claims if isinstance(claims, dict) else {}
+
+
+def token_expiry(token: str) -> Optional[float]:
+    exp = decode_claims(token).get("exp")
+    return float(exp) if isinstance(exp, (int, float)) else None
+
+
+def is_expired(
+    token: str, *, now: Optional[float] = None, leeway: float = EXPIRY_LEEWAY
+) -> bool:
+    """True if ``token`` carries an ``exp`` claim that has (nearly) passed."""
+
+    expires_at = token_expiry(token)
+    if expires_at is None:
+        return False
+    now = time.time() if now is None else now
+    return expires_at - leeway <= now
+
+
+def token_subject(token: str) -> Optional[str]:
+    """Return the user a JWT was issued to, or ``None`` if it does not say."""
+
+    claims = decode_claims(token)
+    return claims.get("preferred_username") or claims.get("upn") or claims.get("sub")
+
+
+def _format_time(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime(
+        "%Y-%m-%d %H:%M UTC"
+    )
+
+
+def check_token(token: str, source: str = "token") -> str:
+    """Return ``token``, or raise :class:`TokenExpiredError` if it expired."""
+
+    if is_expired(token):
+        expires_at = token_expiry(token)
+        assert expires_at is not None
+        raise TokenExpiredError(
+            f"The {source} expired at {_format_time(expires_at)}; "
+            "capture a new one from the timetable dashboard."
+        )
+    return token
+
+
+@dataclass
+class StoredToken:
+    token: str
+    source: str
+    saved_at: float
+    expires_at: Optional[float] = None
+    subject: Optional[str] = None
+
+    @classmethod
+    def create(cls, token: str, source: str) -> "StoredToken":
+        return cls(
+            token=token,
+            source=source,
+            saved_at=time.time(),
+            expires_at=token_expiry(token),
+            subject=token_subject(token),
+        )
+
+
+class TokenStore:
+    """Named token profiles kept in one JSON file."""
+
+    def __init__(self, path: Path = TOKEN_STORE_PATH) -> None:
+        self.path = path
+
+    def _read(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as exc:
+            logging.warning("Failed to read token store: %s", exc)
+            return {}
+        return data.get("profiles", {}) if isinstance(data, dict) else {}
+
+    def _write(self, profiles: Dict[str, Dict[str, Any]]) -> None:
+        data = json.dumps({"profiles": profiles}, indent=2, sort_keys=True)
+        try:
+            util.write_if_changed(self.path, data.encode("utf-8"), mode=0o600)
+        except OSError as exc:  # pragma: no cover
+            logging.warning("Failed to write token store: %s", exc)
+
+    def profiles(self) -> List[str]:
+        return sorted(self._read())
+
+    def load(self, profile: str = DEFAULT_PROFILE) -> Optional[StoredToken]:
+        entry = self._read().get(profile)
+        if not entry or not _normalize_token(entry.get("token")):
+            return None
+        fields = StoredToken.__dataclass_fields__
+        return StoredToken(**{k: v for k, v in entry.items() if k in fields})
+
+    def save(
+        self, token: str, *, profile: str = DEFAULT_PROFILE, source: str = "manual"
+    ) -> StoredToken:
+        """Remember ``token`` for ``profile``; unchanged tokens are not rewritten."""
+
+        current = self._read().get(profile)
+        if current and current.get("token") == token:
+            return StoredToken.create(token, current.get("source", source))
+        entry = StoredToken.create(token, source)
+        # Re-read under the lock so concurrent runs saving other profiles
+        # do not overwrite each other.
+        with util.file_lock(self.path):
+            profiles = self._read()
+            profiles[profile] = asdict(entry)
+            self._write(profiles)
+        return entry
+
+    def remove(self, profile: str) -> bool:
+        with util.file_lock(self.path):
+            profiles = self._read()
+            if profiles.pop(profile, None) is None:
+                return False
+            self._write(profiles)
+        return True
+
+
 def _read_cached_token() -> Optional[str]:
+    """Return the token from the pre-profile ``token.txt`` cache, if any."""
+
     if TOKEN_CACHE_PATH.exists():
         try:
             cached = TOKEN_CACHE_PATH.read_text(encoding="utf-8")
@@ -38,32 +199,49 @@ def _read_cached_token() -> Optional[str]:
     return None
 
 
-def _write_cached_token(token: str) -> None:
-    normalized = _normalize_token(token)
-    if not normalized:
-        return
-    try:
-        TOKEN_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
-        TOKEN_CACHE_PATH.write_text(normalized, encoding="utf-8")
-    except OSError as exc:  # pragma: no cover
-        logging.warning("Failed to write token cache: %s", exc)
-
-
-def acquire_token(*, explicit_token: Optional[str] = None) -> str:
-    """Return a bearer token using CLI/env/user-provided sources only."""
-
-    candidates = [
-        _normalize_token(explicit_token),
-        _normalize_token(os.getenv("HW_TIMETABLE_ACCESS_TOKEN")),
+def acquire_token(
+    *,
+    explicit_token: Optional[str] = None,
+    profile: str = DEFAULT_PROFILE,
+    store: Optional[TokenStore] = None,
+) -> str:
+    """Return a bearer token using CLI/env/user-provided sources only.
+
+    ``HW_TIMETABLE_ACCESS_TOKEN`` and the legacy ``token.txt`` cache only
+    feed the default profile. Candidates that are known to have expired are
+    skipped; if nothing else is available a :class:`TokenExpiredError` is
+    raised without touching the API.
+    """
+
+    store = store or TokenStore()
+    stored = store.load(profile)
+    candidates: List[Tuple[Optional[str], str, str]] = [
+        (_normalize_token(explicit_token), "argument", "supplied token"),
     ]
-
-    candidates.append(_read_cached_token())
-
-    for token in candidates:
-        if token:
-            _write_cached_token(token)
-            return token
-
+    if profile == DEFAULT_PROFILE:
+        env_token = _normalize_token(os.getenv("HW_TIMETABLE_ACCESS_TOKEN"))
+        candidates.append((env_token, "environment", "HW_TIMETABLE_ACCESS_TOKEN"))
+    if stored is not None:
+        label = f"stored token for profile {profile!r}"
+        candidates.append((stored.token, stored.source, label))
+    if profile == DEFAULT_PROFILE:
+        candidates.append((_read_cached_token(), "token.txt", "cached token"))
+
+    expired: Optional[TokenExpiredError] = None
+    for token, source, label in candidates:
+        if not token:
+            continue
+        try:
+            check_token(token, label)
+        except TokenExpiredError as exc:
+            logging.warning("%s", exc)
+            expired = expired or exc
+            continue
+        store.save(token, profile=profile, source=source)
+        return token
+
+    if expired is not None:
+        raise expired
     raise RuntimeError(
         "No API token available. Pass --token or set HW_TIMETABLE_ACCESS_TOKEN."
     )
@@ -0,0 +1,215 @@
+"""Export many timetables from one process.
+
+A manifest is a JSON list with one object per student::
+
+    [
+        {"name": "alice", "token": "eyJ...", "filter_type": "Lab"},
+        {"name": "bob", "token": "eyJ...", "output": "bob-s2.ics",
+         "only_current_semester": true}
+    ]
+
+Each entry needs a ``token``, or a ``profile`` naming a token saved in the
+token store (see :mod:`hw_timetable.auth`). ``output`` is a file name inside
+``<out dir>/ics`` and defaults to ``<name>.ics``; paths are rejected, as is an
+entry whose output an earlier entry already writes. The remaining keys mirror
+the CLI options: ``tz``, ``include_blocked``, ``start``, ``end``,
+``filter_course`` (string or list), ``filter_type`` (comma-separated string or
+list) and ``only_current_semester``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from . import api, auth, cache, metrics
+
+OPTION_KEYS = {
+    "tz",
+    "include_blocked",
+    "start",
+    "end",
+    "filter_course",
+    "filter_type",
+    "only_current_semester",
+}
+
+
+@dataclass
+class BatchResult:
+    name: str
+    output: Optional[Path] = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def load_manifest(path: Path) -> List[Dict[str, Any]]:
+    with path.open("r", encoding="utf-8") as f:
+        entries = json.load(f)
+    if not isinstance(entries, list):
+        raise RuntimeError(f"Batch manifest {path} must contain a JSON list")
+    return entries
+
+
+def entry_args(
+    entry: Dict[str, Any], base: argparse.Namespace, index: int
+) -> argparse.Namespace:
+    """Overlay one manifest entry on the batch-wide CLI options."""
+
+    unknown = set(entry) - OPTION_KEYS - {"name", "token", "profile", "output"}
+    if unknown:
+        raise RuntimeError(f"Unknown manifest keys: {', '.join(sorted(unknown))}")
+    args = argparse.Namespace(**vars(base))
+    args.batch = None
+    args.preview = False
+    for key in OPTION_KEYS & set(entry):
+        args.__dict__[key] = entry[key]
+    if isinstance(args.filter_course, str):
+        args.filter_course = [args.filter_course]
+    if isinstance(args.filter_type, list):
+        args.filter_type = ",".join(args.filter_type)
+    args.output = str(Path(base.out_dir) / "ics" / entry_output(entry, index))
+    return args
+
+
+def entry_output(entry: Dict[str, Any], index: int) -> str:
+    """Return the entry's calendar file name inside ``<out dir>/ics``."""
+
+    name = entry.get("name") or f"entry-{index}"
+    output = entry.get("output") or f"{name}.ics"
+    if (
+        not isinstance(output, str)
+        or Path(output).name != output
+        or output in (".", "..")
+        or "\\" in output
+    ):
+        raise RuntimeError(f"Manifest output must be a file name, not {output!r}")
+    return output
+
+
+def _duplicate_outputs(entries: List[Dict[str, Any]]) -> Dict[int, str]:
+    """Map each entry whose output an earlier entry claimed to that entry."""
+
+    owners: Dict[str, str] = {}
+    duplicates: Dict[int, str] = {}
+    for index, entry in enumerate(entries):
+        try:
+            # Case-insensitive file systems would merge names differing in case.
+            key = entry_output(entry, index).casefold()
+        except Exception:
+            continue  # reported when the entry runs
+        name = entry.get("name") or f"entry-{index}"
+        if key in owners:
+            duplicates[index] = owners[key]
+        else:
+            owners[key] = name
+    return duplicates
+
+
+def entry_token(entry: Dict[str, Any], store: Optional[auth.TokenStore] = None) -> str:
+    """Return the entry's token, rejecting known-expired tokens up front."""
+
+    token = auth._normalize_token(entry.get("token"))
+    if token:
+        return auth.check_token(token)
+    profile = entry.get("profile")
+    if profile:
+        stored = (store or auth.TokenStore()).load(profile)
+        if stored is None:
+            raise RuntimeError(f"No stored token for profile {profile!r}")
+        return auth.check_token(stored.token, f"token of profile {profile!r}")
+    raise RuntimeError("Manifest entry has no token")
+
+
+def run_batch(
+    entries: List[Dict[str, Any]],
+    base: argparse.Namespace,
+    *,
+    workers: int = 4,
+    session: Any = None,
+    memo: Optional[cache.ResponseMemo] = None,
+    stats: metrics.MetricsLike = metrics.NULL,
+) -> List[BatchResult]:
+    """Export every entry through a bounded pool that shares one HTTP session.
+
+    Entries also share a response memo, so entries for the same user fetch
+    each endpoint once. Failures are captured per entry so one bad token does
+    not stop the rest.
+    """
+
+    from . import cli
+
+    workers = max(1, workers)
+    if session is None:
+        session = api.pooled_session(workers * len(api.ENDPOINTS))
+    if memo is None:
+        memo = cache.ResponseMemo()
+    # One policy for the whole batch, so --deadline bounds the entire run.
+    retry = cli.make_retry_policy(base)
+    duplicates = _duplicate_outputs(entries)
+
+    def export_entry(index: int, entry: Dict[str, Any]) -> BatchResult:
+        name = f"entry-{index}"
+        try:
+            if not isinstance(entry, dict):
+                raise RuntimeError("Manifest entries must be JSON objects")
+            name = entry.get("name") or name
+            args = entry_args(entry, base, index)
+            if index in duplicates:
+                raise RuntimeError(
+                    f"Output {Path(args.output).name} is already written by "
+                    f"entry {duplicates[index]!r}"
+                )
+            token = entry_token(entry)
+            client = api.APIClient(
+                token,
+                use_cache=args.use_cache,
+                cache_ttl=args.cache_ttl,
+                out_dir=Path(args.out_dir),
+                cache_dir=Path(args.cache_dir) if args.cache_dir else None,
+                session=session,
+                refresh_token=False,
+                # A token given in the entry itself belongs to no profile.
+                token_profile=entry.get("profile"),
+                memo=memo,
+                retry=retry,
+            )
+            output = cli.export(args, client=client, stats=stats)
+            return BatchResult(name, output=output)
+        except Exception as exc:
+            logging.debug("Batch entry %s failed", name, exc_info=True)
+            return BatchResult(name, error=str(exc) or type(exc).__name__)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(export_entry, index, entry)
+            for index, entry in enumerate(entries)
+        ]
+        results = [future.result() for future in futures]
+    logging.debug("Batch response memo: %s", memo.stats())
+    return results
+
+
+def run_manifest(
+    path: Path,
+    base: argparse.Namespace,
+    *,
+    stats: metrics.MetricsLike = metrics.NULL,
+) -> List[BatchResult]:
+    results = run_batch(load_manifest(path), base, workers=base.workers, stats=stats)
+    for result in results:
+        if result.ok:
+            print(f"OK {result.name} -> {result.output}")
+        else:
+            print(f"FAILED {result.name}: {result.error}")
+    failed = sum(not r.ok for r in results)
+    print(f"{len(results) - failed}/{len(results)} calendars exported")
+    return results
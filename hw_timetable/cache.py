@@ -0,0 +1,238 @@
+"""HTTP response caches.
+
+``ResponseCache`` is the on-disk cache revalidated with ETag /
+Last-Modified; ``ResponseMemo`` is an in-process memo that several clients
+can share and that coalesces concurrent fetches of the same response.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Hashable, Mapping, Optional, Tuple
+
+from . import util
+
+DEFAULT_TTL = 300.0
+# Reference data changes far less often than the activity feed.
+ENDPOINT_TTLS: Dict[str, float] = {
+    "/Student/programme-info": 3600.0,
+    "/systemadmin/semesters": 86400.0,
+}
+DEFAULT_MEMO_TTL = 60.0
+DEFAULT_MEMO_SIZE = 256
+
+
+@dataclass
+class CacheEntry:
+    body: bytes
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+    ttl: float
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        return now - self.fetched_at < self.ttl
+
+    def conditional_headers(self) -> Dict[str, str]:
+        headers: Dict[str, str] = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+def namespace(token: Optional[str], profile: Optional[str] = None) -> str:
+    """Return a directory name that keeps different users' responses apart.
+
+    Users are told apart as in :func:`hw_timetable.manifest.user_identity`,
+    so a rotated token keeps its predecessor's entries and validators.
+    """
+
+    from .manifest import user_identity
+
+    identity = user_identity(token, profile)
+    if identity is None:
+        return "anonymous"
+    return hashlib.sha256(identity.encode()).hexdigest()[:16]
+
+
+class ResponseCache:
+    def __init__(self, directory: Path, *, ttl: Optional[float] = None) -> None:
+        self.directory = directory
+        self.ttl = ttl
+
+    def _paths(self, endpoint: str) -> tuple[Path, Path]:
+        name = endpoint.strip("/").replace("/", "_")
+        return self.directory / f"{name}.body", self.directory / f"{name}.meta.json"
+
+    def ttl_for(self, endpoint: str) -> float:
+        if self.ttl is not None:
+            return self.ttl
+        return ENDPOINT_TTLS.get(endpoint, DEFAULT_TTL)
+
+    def load(self, endpoint: str) -> Optional[CacheEntry]:
+        body_path, meta_path = self._paths(endpoint)
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            body = body_path.read_bytes()
+        except (OSError, ValueError):
+            return None
+        # Body and metadata are separate files; another process may have
+        # replaced one of them since the other was written.
+        if meta.get("sha256") != hashlib.sha256(body).hexdigest():
+            logging.debug("Discarding inconsistent cache entry for %s", endpoint)
+            return None
+        return CacheEntry(
+            body=body,
+            etag=meta.get("etag"),
+            last_modified=meta.get("last_modified"),
+            fetched_at=float(meta.get("fetched_at", 0)),
+            ttl=self.ttl_for(endpoint),
+        )
+
+    def _write_meta(self, endpoint: str, entry: CacheEntry) -> None:
+        _, meta_path = self._paths(endpoint)
+        meta = {
+            "etag": entry.etag,
+            "last_modified": entry.last_modified,
+            "fetched_at": entry.fetched_at,
+            "ttl": entry.ttl,
+            "size": len(entry.body),
+            "sha256": hashlib.sha256(entry.body).hexdigest(),
+        }
+        util.write_if_changed(meta_path, json.dumps(meta).encode("utf-8"))
+
+    def store(
+        self, endpoint: str, body: bytes, headers: Mapping[str, str]
+    ) -> CacheEntry:
+        entry = CacheEntry(
+            body=body,
+            etag=headers.get("ETag"),
+            last_modified=headers.get("Last-Modified"),
+            fetched_at=time.time(),
+            ttl=self.ttl_for(endpoint),
+        )
+        if not entry.etag and not entry.last_modified and entry.ttl <= 0:
+            return entry
+        body_path, _ = self._paths(endpoint)
+        try:
+            util.write_if_changed(body_path, body)
+            self._write_meta(endpoint, entry)
+        except OSError as exc:  # pragma: no cover - disk issues are rare
+            logging.warning("Failed to write response cache: %s", exc)
+        return entry
+
+    def revalidated(
+        self, endpoint: str, entry: CacheEntry, headers: Mapping[str, str]
+    ) -> CacheEntry:
+        """Record a 304 answer: keep the body, refresh validators and age."""
+
+        entry.etag = headers.get("ETag") or entry.etag
+        entry.last_modified = headers.get("Last-Modified") or entry.last_modified
+        entry.fetched_at = time.time()
+        try:
+            self._write_meta(endpoint, entry)
+        except OSError as exc:  # pragma: no cover
+            logging.warning("Failed to update response cache: %s", exc)
+        return entry
+
+
+class _Flight:
+    """A fetch in progress that other callers can wait on."""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.body: Optional[bytes] = None
+        self.error: Optional[BaseException] = None
+
+    def wait(self) -> bytes:
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        assert self.body is not None
+        return self.body
+
+
+class ResponseMemo:
+    """Bounded, TTL-based in-memory memo with single-flight fetching.
+
+    While one caller fetches a key, concurrent callers for the same key wait
+    for that fetch instead of sending their own request. Failures are not
+    memoised; every waiter of a failed flight sees the same exception.
+    """
+
+    def __init__(
+        self, *, ttl: float = DEFAULT_MEMO_TTL, max_entries: int = DEFAULT_MEMO_SIZE
+    ) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[Hashable, Tuple[float, bytes]] = OrderedDict()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "entries": len(self._entries),
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get(self, key: Hashable, fetch: Callable[[], bytes]) -> bytes:
+        """Return the body for ``key``, calling ``fetch`` when it is missing.
+
+        Concurrent callers for the same key share a single ``fetch`` call.
+        """
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return flight.wait()
+
+        try:
+            body = fetch()
+        except BaseException as exc:
+            flight.error = exc
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+            raise
+        flight.body = body
+        with self._lock:
+            if self.ttl > 0:
+                self._entries[key] = (time.monotonic() + self.ttl, body)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            del self._flights[key]
+        flight.done.set()
+        return body
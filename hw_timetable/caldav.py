@@ -0,0 +1,189 @@
+"""Incremental CalDAV output sink.
+
+Each VEVENT is stored as its own ``<uid>.ics`` resource in a CalDAV
+collection. A state file remembers the content hash and server ETag of every
+resource pushed so far, so a sync only PUTs new or modified events and DELETEs
+events that disappeared. Updates and deletes are conditional on the stored
+ETag (``If-Match``) and creations on the resource not existing yet
+(``If-None-Match: *``).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from . import api, ics_builder, incremental, util
+
+STATE_DIR = Path("out/caldav")
+
+
+@dataclass
+class SyncResult:
+    created: List[str] = field(default_factory=list)
+    updated: List[str] = field(default_factory=list)
+    deleted: List[str] = field(default_factory=list)
+    unchanged: int = 0
+    failed: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed
+
+
+def render_event(e: ics_builder.Event, dtstamp: datetime) -> bytes:
+    """Return a standalone VCALENDAR document holding just ``e``."""
+
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//HW Timetable Exporter//EN",
+        "CALSCALE:GREGORIAN",
+        *ics_builder.VTIMEZONE_LINES,
+        *ics_builder.event_lines(e, dtstamp),
+        "END:VCALENDAR",
+    ]
+    return b"".join(ics_builder.iter_ics_chunks(lines))
+
+
+class CalDAVSink:
+    def __init__(
+        self,
+        collection_url: str,
+        *,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        state_path: Optional[Path] = None,
+        state_dir: Path = STATE_DIR,
+        max_workers: int = 4,
+        session: Any = None,
+    ) -> None:
+        self.collection_url = collection_url.rstrip("/") + "/"
+        self.max_workers = max(1, max_workers)
+        self.session = session or api.pooled_session(self.max_workers)
+        if username is not None:
+            self.session.auth = (username, password or "")
+        if state_path is None:
+            digest = hashlib.sha256(self.collection_url.encode()).hexdigest()[:16]
+            state_path = state_dir / f"{digest}.json"
+        self.state_path = state_path
+
+    def _load_state(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            return json.loads(self.state_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self, state: Dict[str, Dict[str, Any]]) -> None:
+        data = json.dumps(state, indent=1, sort_keys=True).encode("utf-8")
+        util.write_if_changed(self.state_path, data)
+
+    def _href(self, uid: str) -> str:
+        return f"{self.collection_url}{uid}.ics"
+
+    def _current_etag(self, url: str) -> Optional[str]:
+        resp = self.session.head(url, timeout=30)
+        if resp.status_code == 404:
+            return None
+        resp.raise_for_status()
+        return resp.headers.get("ETag")
+
+    def _put(self, uid: str, body: bytes, etag: Optional[str]) -> Optional[str]:
+        url = self._href(uid)
+        headers = {"Content-Type": "text/calendar; charset=utf-8"}
+        headers.update({"If-Match": etag} if etag else {"If-None-Match": "*"})
+        resp = self.session.put(url, data=body, headers=headers, timeout=30)
+        if resp.status_code == 412:
+            # Our view of the resource is out of date (lost state or an edit
+            # on the server). The timetable is authoritative: retry once
+            # against the server's current version.
+            logging.info("CalDAV conflict on %s; overwriting server copy", uid)
+            current = self._current_etag(url)
+            headers.pop("If-Match", None)
+            headers.pop("If-None-Match", None)
+            headers.update({"If-Match": current} if current else {"If-None-Match": "*"})
+            resp = self.session.put(url, data=body, headers=headers, timeout=30)
+        resp.raise_for_status()
+        return resp.headers.get("ETag")
+
+    def _delete(self, uid: str, etag: Optional[str]) -> None:
+        url = self._href(uid)
+        headers = {"If-Match": etag} if etag else {}
+        resp = self.session.delete(url, headers=headers, timeout=30)
+        if resp.status_code == 412:
+            logging.info("CalDAV conflict deleting %s; retrying", uid)
+            current = self._current_etag(url)
+            if current is None:
+                return
+            resp = self.session.delete(url, headers={"If-Match": current}, timeout=30)
+        if resp.status_code == 404:
+            return
+        resp.raise_for_status()
+
+    def sync(self, events: Iterable[ics_builder.Event]) -> SyncResult:
+        """Push the changes between ``events`` and the last sync."""
+
+        # Two runs syncing the same collection would otherwise race on the
+        # state file and push the same changes twice.
+        with util.file_lock(self.state_path):
+            return self._sync(events)
+
+    def _sync(self, events: Iterable[ics_builder.Event]) -> SyncResult:
+        state = self._load_state()
+        desired: Dict[str, ics_builder.Event] = {}
+        for e in events:
+            if e.uid in desired:
+                logging.warning("Duplicate UID %s; keeping the first event", e.uid)
+                continue
+            desired[e.uid] = e
+        hashes = {uid: incremental.event_hash(e) for uid, e in desired.items()}
+        to_put = [
+            uid for uid in desired if state.get(uid, {}).get("hash") != hashes[uid]
+        ]
+        to_delete = [uid for uid in state if uid not in desired]
+        result = SyncResult(unchanged=len(desired) - len(to_put))
+        now = datetime.now(timezone.utc)
+
+        def push(uid: str) -> None:
+            previous = state.get(uid)
+            etag = self._put(
+                uid,
+                render_event(desired[uid], now),
+                previous.get("etag") if previous else None,
+            )
+            state[uid] = {"hash": hashes[uid], "etag": etag}
+            (result.updated if previous else result.created).append(uid)
+
+        def remove(uid: str) -> None:
+            self._delete(uid, state[uid].get("etag"))
+            del state[uid]
+            result.deleted.append(uid)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            jobs = {pool.submit(push, uid): uid for uid in to_put}
+            jobs.update({pool.submit(remove, uid): uid for uid in to_delete})
+            for future, uid in jobs.items():
+                try:
+                    future.result()
+                except Exception as exc:
+                    logging.warning("CalDAV sync of %s failed: %s", uid, exc)
+                    result.failed[uid] = str(exc)
+        for names in (result.created, result.updated, result.deleted):
+            names.sort()
+        self._save_state(state)
+        logging.info(
+            "CalDAV sync: %d created, %d updated, %d deleted, %d unchanged, "
+            "%d failed",
+            len(result.created),
+            len(result.updated),
+            len(result.deleted),
+            result.unchanged,
+            len(result.failed),
+        )
+        return result
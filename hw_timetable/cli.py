@@ -1,17 +1,57 @@
 from __future__ import annotations
 
 import argparse
+import logging
 import os
+import sys
 from datetime import date, datetime, timezone
 from pathlib import Path
-from typing import List
+from typing import Any, Callable, Dict, List
 
-try:
-    from dotenv import load_dotenv
-except ImportError:
-    load_dotenv = None
+# Heavy modules (pydantic, requests, dotenv, the ICS builder) are imported on
+# the code paths that need them so --help and offline runs start quickly.
+from . import api, metrics, util
 
-from . import api, ics_builder, models, util
+# Which options make a run need each endpoint; anything not needed is skipped.
+ENDPOINT_REQUIREMENTS: Dict[str, Callable[[argparse.Namespace], bool]] = {
+    "/Student/programme-info": lambda args: True,
+    "/systemadmin/semesters": lambda args: args.only_current_semester,
+    "/activity/activities": lambda args: True,
+    "/activity/blocked-out-periods": lambda args: args.include_blocked,
+    "/activity/ad-hoc": lambda args: False,
+}
+
+
+def required_endpoints(args: argparse.Namespace) -> List[str]:
+    """Return the endpoints this run needs; ``--dump-json`` snapshots all."""
+
+    if args.dump_json:
+        return list(api.ENDPOINTS)
+    return [e for e in api.ENDPOINTS if ENDPOINT_REQUIREMENTS[e](args)]
+
+
+def effective_options(args: argparse.Namespace) -> Dict[str, Any]:
+    """Return the options that shape the calendar, for build manifests."""
+
+    options: Dict[str, Any] = {
+        "tz": args.tz,
+        "include_blocked": args.include_blocked,
+        "start": args.start,
+        "end": args.end,
+        "filter_course": sorted(args.filter_course or []),
+        "filter_type": sorted(args.filter_type.split(",")) if args.filter_type else [],
+        "only_current_semester": args.only_current_semester,
+        "reproducible": args.reproducible,
+        "recurrence": args.recurrence,
+        "output": args.output,
+        # A run that pushes to CalDAV is not done just because the file is.
+        "caldav_url": args.caldav_url,
+        "caldav_user": args.caldav_user,
+    }
+    if args.only_current_semester:
+        # The selected semester depends on the date the run happens.
+        options["today"] = util.today().isoformat()
+    return options
 
 
 def parse_args(argv: List[str] | None = None) -> argparse.Namespace:
@@ -39,90 +79,476 @@ def parse_args(argv: List[str] | None = None) -> argparse.Namespace:
     parser.add_argument(
         "--offline", action="store_true", help="Use saved JSON fixtures"
     )
+    parser.add_argument(
+        "--trusted-input",
+        action="store_true",
+        help="Skip pydantic validation of activities (faster for trusted payloads)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        dest="use_cache",
+        action="store_false",
+        help="Always download full responses instead of revalidating the cache",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        help="Seconds a cached response is reused without revalidation",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=4,
+        help="Requests sent per endpoint before giving up (429/5xx/network errors)",
+    )
+    parser.add_argument(
+        "--deadline",
+        type=float,
+        help="Give up on API requests once this many seconds have passed",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help=(
+            "Write the calendar to this path instead of <out dir>/ics/<derived name>; "
+            "'-' writes to stdout"
+        ),
+    )
+    parser.add_argument(
+        "--out-dir",
+        default="out",
+        help="Directory for calendars, JSON dumps, manifests and sync state",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help="Directory for the HTTP response cache (default <out dir>/cache)",
+    )
+    parser.add_argument(
+        "--batch",
+        metavar="MANIFEST",
+        help="Export every entry of a JSON manifest (see hw_timetable.batch)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Concurrent exports in --batch mode",
+    )
+    parser.add_argument(
+        "--recurrence",
+        # Mirrors recurrence.MODES, kept literal so --help stays import-light.
+        choices=("rrule", "compact", "weekly"),
+        default="rrule",
+        help=(
+            "How repeating classes are encoded: smallest of INTERVAL/EXDATE "
+            "and split events (rrule), the same plus RDATE (compact), or one "
+            "weekly RRULE with EXDATEs (weekly)"
+        ),
+    )
+    parser.add_argument(
+        "--reproducible",
+        action="store_true",
+        help=(
+            "Byte-identical output for unchanged data: stable event order, "
+            "data-derived DTSTAMP and an <output>.etag content hash"
+        ),
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help=(
+            "Reuse unchanged VEVENTs from the previous calendar and write an "
+            "<output>.changes.json summary"
+        ),
+    )
+    parser.add_argument(
+        "--caldav-url",
+        help="Also push changed events to this CalDAV collection URL",
+    )
+    parser.add_argument(
+        "--caldav-user",
+        help="CalDAV user name (password from HW_TIMETABLE_CALDAV_PASSWORD)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Rebuild even if the payloads and options match the last run",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Serve the calendar as an HTTP feed (see hw_timetable.server)",
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Address for --serve")
+    parser.add_argument("--port", type=int, default=8080, help="Port for --serve")
+    parser.add_argument(
+        "--refresh-interval",
+        type=float,
+        default=900,
+        help="Seconds between background API refreshes in --serve mode",
+    )
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="Print per-stage timings and counters to stderr",
+    )
+    parser.add_argument(
+        "--metrics-json",
+        metavar="PATH",
+        help="Write per-stage timings and counters to this JSON file",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="",
+        metavar="PATH",
+        help=(
+            "Run the pipeline stages under cProfile, save a .pstats file "
+            "(default <out dir>/profile.pstats) and print the top functions"
+        ),
+    )
+    parser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="Trace allocations per stage with tracemalloc and print the top sites",
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=20,
+        metavar="N",
+        help="Entries shown in the --profile/--profile-memory summaries",
+    )
     parser.add_argument("--preview", action="store_true")
     parser.add_argument("--verbose", action="store_true")
     parser.add_argument(
         "--token",
         help="Explicit bearer token to call the HW timetable API",
     )
-    return parser.parse_args(argv)
+    parser.add_argument(
+        "--token-profile",
+        default="default",
+        metavar="NAME",
+        help="Named token profile to read and remember tokens under",
+    )
+    args = parser.parse_args(argv)
+    if args.batch and (args.offline or args.dump_json):
+        parser.error("--batch cannot be combined with --offline or --dump-json")
+    if args.batch and args.caldav_url:
+        # Every entry would sync into (and prune) the same collection.
+        parser.error("--batch cannot be combined with --caldav-url")
+    if args.incremental and args.output == "-":
+        parser.error("--incremental needs a calendar file, not stdout")
+    if args.serve and (args.batch or args.dump_json):
+        parser.error("--serve cannot be combined with --batch or --dump-json")
+    if (args.profile is not None or args.profile_memory) and (args.batch or args.serve):
+        parser.error("profiling works on single exports, not --batch or --serve")
+    if args.serve and args.deadline is not None:
+        parser.error("--deadline applies to one-off exports, not --serve")
+    return args
 
 
-def main(argv: List[str] | None = None) -> None:
-    if load_dotenv:
-        load_dotenv()
+def _load_dotenv() -> None:
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        return
+    load_dotenv()
+
 
+def main(argv: List[str] | None = None) -> None:
     args = parse_args(argv)
+    if not args.offline:
+        _load_dotenv()
     util.configure_logging(args.verbose)
+    if args.serve:
+        from . import server
+
+        server.serve(args)
+        return
+    stats: metrics.MetricsLike = metrics.NULL
+    if args.profile is not None or args.profile_memory:
+        from .profiling import ProfilingMetrics
+
+        stats = ProfilingMetrics(
+            cpu_profile=(
+                None
+                if args.profile is None
+                else Path(args.profile or Path(args.out_dir) / "profile.pstats")
+            ),
+            memory=args.profile_memory,
+            top=args.profile_top,
+        )
+    elif args.timings or args.metrics_json:
+        stats = metrics.Metrics()
+    try:
+        with stats.stage("total"):
+            run(args, stats)
+    finally:
+        report_metrics(args, stats)
+
+
+def run(args: argparse.Namespace, stats: metrics.MetricsLike) -> None:
+    if args.batch:
+        from . import batch
+
+        results = batch.run_manifest(Path(args.batch), args, stats=stats)
+        if not all(r.ok for r in results):
+            raise SystemExit(1)
+        return
+    export(args, stats=stats)
+
+
+def report_metrics(args: argparse.Namespace, stats: metrics.MetricsLike) -> None:
+    if not isinstance(stats, metrics.Metrics):
+        return
+    finish = getattr(stats, "finish", None)
+    if finish is not None:
+        print(finish(), file=sys.stderr)
+    if args.timings:
+        print(stats.report(), file=sys.stderr)
+    if args.metrics_json:
+        import json
+
+        data = json.dumps(stats.as_dict(), indent=2) + "\n"
+        util.write_if_changed(Path(args.metrics_json), data.encode("utf-8"))
+
+
+def make_retry_policy(args: argparse.Namespace) -> Any:
+    from .retry import RetryPolicy
+
+    return RetryPolicy(attempts=args.retries, run_budget=args.deadline)
+
+
+def make_client(args: argparse.Namespace) -> api.APIClient:
+    token = None
+    if not args.offline:
+        from . import auth
+
+        token = auth.acquire_token(
+            explicit_token=args.token, profile=args.token_profile
+        )
+
+    return api.APIClient(
+        token,
+        dump_json=args.dump_json,
+        offline=args.offline,
+        use_cache=args.use_cache,
+        cache_ttl=args.cache_ttl,
+        token_profile=args.token_profile,
+        out_dir=Path(args.out_dir),
+        cache_dir=Path(args.cache_dir) if args.cache_dir else None,
+        retry=make_retry_policy(args),
+    )
+
+
+def current_semester_activities(
+    activities: List[Any], semesters: List[dict]
+) -> List[Any]:
+    """Keep only activities of the semester running today, if one is found."""
+
+    today = util.today()
+    current_sem = None
+    for sem in semesters:
+        # Safely get start/end dates
+        s_date = sem.get("StartDate")
+        e_date = sem.get("EndDate")
+        if s_date and e_date:
+            start_sem = date.fromisoformat(s_date)
+            end_sem = date.fromisoformat(e_date)
+            if start_sem <= today <= end_sem:
+                current_sem = sem.get("Code") or sem.get("SemesterCode")
+
+    if current_sem:
+        return [a for a in activities if a.SemesterCode == current_sem]
+    return activities
+
+
+def export(
+    args: argparse.Namespace,
+    *,
+    client: api.APIClient | None = None,
+    stats: metrics.MetricsLike = metrics.NULL,
+) -> Path | None:
+    """Run one fetch-build-write cycle and return the calendar path.
+
+    Returns ``None`` when the calendar was written to stdout. Stage timings
+    and counters are recorded in ``stats``.
+    """
+
+    from . import ics_builder, manifest, models, weeks
+
     tz = util.parse_timezone(args.tz)
     start = date.fromisoformat(args.start) if args.start else None
     end = date.fromisoformat(args.end) if args.end else None
     filter_courses = set(args.filter_course) if args.filter_course else None
     filter_types = set(args.filter_type.split(",")) if args.filter_type else None
 
-    token = None
-    if not args.offline:
-        from . import auth
+    if client is None:
+        client = make_client(args)
+    build_options = effective_options(args)
+    manifest_file = manifest.manifest_path(
+        build_options,
+        manifest.user_identity(client.token, client.token_profile),
+        Path(args.out_dir) / "manifests",
+    )
+    previous = manifest.load(manifest_file)
+    # Inputs read on demand last time (the semester table that anchors
+    # bitstring week patterns) decide whether this run can be skipped too.
+    inputs = required_endpoints(args)
+    endpoints = manifest.consumed_endpoints(previous, inputs)
+    payloads = api.Payloads(client)
+    with stats.stage("fetch"):
+        payloads.prefetch(endpoints)
+    if stats.enabled:
+        stats.count("endpoints_fetched", len(endpoints))
+        stats.count("bytes_received", sum(len(payloads.raw(e)) for e in endpoints))
 
-        explicit_token = args.token or os.getenv("HW_TIMETABLE_ACCESS_TOKEN")
-        token = auth.acquire_token(explicit_token=explicit_token)
+    hashes = manifest.payload_hashes(payloads, endpoints)
+    may_skip = not (args.force or args.preview or args.output == "-")
+    if may_skip and manifest.is_current(previous, build_options, hashes):
+        logging.info("Timetable unchanged since the last run; nothing to do")
+        out_path = Path(previous["output"])
+        if args.incremental:
+            from . import incremental
 
-    client = api.APIClient(token, dump_json=args.dump_json, offline=args.offline)
-    programme_info = client.get("/Student/programme-info")
-    semesters = client.get("/systemadmin/semesters")
-    activities_data = client.get("/activity/activities")
-    blocked_data = client.get("/activity/blocked-out-periods")
-    client.get("/activity/ad-hoc")  # fetched for completeness
+            # The previous run's changes have been consumed already.
+            incremental.write_changes(out_path, incremental.ChangeSummary())
+        return out_path
 
-    # --- REFACTOR START ---
-    # Pydantic automatically handles validation and nested object creation.
-    # We use model_validate (Pydantic v2) to parse the dictionary lists.
-    activities = [models.Activity.model_validate(a) for a in activities_data]
-    blocked_periods = [models.BlockedPeriod.model_validate(b) for b in blocked_data]
-    # --- REFACTOR END ---
+    with stats.stage("validate"):
+        programme_info = payloads["/Student/programme-info"]
+        blocked_data = (
+            payloads["/activity/blocked-out-periods"] if args.include_blocked else []
+        )
+
+        activities = models.parse_activities(
+            payloads.raw("/activity/activities"), trusted=args.trusted_input
+        )
+        stats.count("activities_validated", len(activities))
+        blocked_periods = [models.BlockedPeriod.model_validate(b) for b in blocked_data]
+
+        if args.only_current_semester:
+            activities = current_semester_activities(
+                activities, payloads["/systemadmin/semesters"]
+            )
+            stats.count("activities_selected", len(activities))
+        week_table = None
+        if weeks.uses_bitstrings(activities):
+            week_table = weeks.WeekTable.from_semesters(
+                payloads["/systemadmin/semesters"]
+            )
+            if "/systemadmin/semesters" not in inputs:
+                inputs.append("/systemadmin/semesters")
+
+    with stats.stage("build"):
+        events = ics_builder.collect_events(
+            activities,
+            blocked_periods,
+            tz=tz,
+            include_blocked=args.include_blocked,
+            start=start,
+            end=end,
+            filter_courses=filter_courses,
+            filter_types=filter_types,
+            week_table=week_table,
+            recurrence=args.recurrence,
+            metrics=stats,
+        )
+
+    synced = True
+    if args.caldav_url:
+        from . import caldav
+
+        sink = caldav.CalDAVSink(
+            args.caldav_url,
+            username=args.caldav_user,
+            password=os.getenv("HW_TIMETABLE_CALDAV_PASSWORD"),
+            state_dir=Path(args.out_dir) / "caldav",
+        )
+        with stats.stage("caldav"):
+            synced = sink.sync(events).ok
+        if not synced:
+            logging.warning("Some events could not be pushed to CalDAV")
+
+    def write(writer: util.HashingWriter) -> None:
+        ics_builder.write_ics(
+            writer,
+            programme_info,
+            events,
+            activities=activities,
+            reproducible=args.reproducible,
+        )
 
-    if args.only_current_semester:
-        today = util.today()
-        current_sem = None
-        for sem in semesters:
-            # Safely get start/end dates
-            s_date = sem.get("StartDate")
-            e_date = sem.get("EndDate")
-            if s_date and e_date:
-                start_sem = date.fromisoformat(s_date)
-                end_sem = date.fromisoformat(e_date)
-                if start_sem <= today <= end_sem:
-                    current_sem = sem.get("Code") or sem.get("SemesterCode")
-
-        if current_sem:
-            activities = [a for a in activities if a.SemesterCode == current_sem]
-
-    ics, events = ics_builder.build_ics(
-        programme_info,
-        activities,
-        blocked_periods,
-        tz=tz,
-        include_blocked=args.include_blocked,
-        start=start,
-        end=end,
-        filter_courses=filter_courses,
-        filter_types=filter_types,
-    )
-
-    out_dir = Path("out/ics")
-    out_dir.mkdir(parents=True, exist_ok=True)
-    filename = ics_builder.output_filename(programme_info, activities=activities)
     # Write binary to avoid newline translation on Windows and preserve CRLF folding.
-    (out_dir / filename).write_bytes(ics.encode("utf-8"))
+    out_path: Path | None
+    with stats.stage("write"):
+        if args.output == "-":
+            out_path = None
+            writer = util.HashingWriter(sys.stdout.buffer)
+            write(writer)
+            sys.stdout.buffer.flush()
+            etag = writer.etag
+        else:
+            if args.output:
+                out_path = Path(args.output)
+            else:
+                filename = ics_builder.output_filename(
+                    programme_info, activities=activities
+                )
+                out_path = Path(args.out_dir) / "ics" / filename
+            # Concurrent runs writing the same calendar take turns, so the file,
+            # its sidecars and the manifest always describe the same build.
+            with util.file_lock(out_path, Path(args.out_dir) / "locks"):
+                if args.incremental:
+                    from . import incremental
+
+                    etag = incremental.write_incremental(
+                        out_path,
+                        programme_info,
+                        events,
+                        activities=activities,
+                        reproducible=args.reproducible,
+                    ).etag
+                else:
+                    # Readers of the published file only ever see a complete calendar.
+                    with util.atomic_write(out_path) as writer:
+                        write(writer)
+                    if not writer.changed:
+                        logging.info("Calendar content unchanged; kept %s", out_path)
+                    etag = writer.etag
+                if args.reproducible:
+                    util.write_if_changed(
+                        out_path.with_name(out_path.name + ".etag"),
+                        f"{etag}\n".encode("utf-8"),
+                    )
+                if synced:
+                    # Otherwise the next run must retry the failed pushes.
+                    manifest.save(
+                        manifest_file,
+                        build_options,
+                        manifest.payload_hashes(payloads, inputs),
+                        out_path,
+                    )
+    if stats.enabled:
+        output_bytes = writer.size if out_path is None else out_path.stat().st_size
+        stats.count("output_bytes", output_bytes)
+    logging.debug("Calendar ETag: %s", etag)
 
     if args.preview:
+        # Keep stdout clean when it carries the calendar itself.
+        preview_stream = sys.stderr if out_path is None else sys.stdout
         now = datetime.now(timezone.utc)
-        upcoming = [e for e in events if e["start"] >= now]
-        upcoming.sort(key=lambda e: e["start"])
+        upcoming = [e for e in events if e.start >= now]
+        upcoming.sort(key=lambda e: e.start)
         for e in upcoming[:10]:
-            local_start = e["start"].astimezone(tz)
-            local_end = e["end"].astimezone(tz)
-            print(f"{local_start:%Y-%m-%d %H:%M} - {local_end:%H:%M} {e['summary']}")
+            local_start = e.start.astimezone(tz)
+            local_end = e.end.astimezone(tz)
+            print(
+                f"{local_start:%Y-%m-%d %H:%M} - {local_end:%H:%M} {e.summary}",
+                file=preview_stream,
+            )
+    return out_path
 
 
 if __name__ == "__main__":
@@ -3,19 +3,73 @@
 from __future__ import annotations
 
 import hashlib
+from collections.abc import Mapping
+from dataclasses import dataclass
 from datetime import date, datetime, time, timedelta, timezone
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+from functools import lru_cache
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
 from zoneinfo import ZoneInfo
 
-from .models import Activity, BlockedPeriod
+from . import weeks
+from .metrics import NULL, MetricsLike
+from .models import ActivityLike, BlockedPeriod
+from .recurrence import encode as encode_recurrence
 
 DASHBOARD_URL = "https://timetableexplorer.hw.ac.uk/timetable-dashboard"
+VTIMEZONE_LINES = [
+    "BEGIN:VTIMEZONE",
+    "TZID:Europe/London",
+    "X-LIC-LOCATION:Europe/London",
+    "BEGIN:DAYLIGHT",
+    "TZOFFSETFROM:+0000",
+    "TZOFFSETTO:+0100",
+    "TZNAME:BST",
+    "DTSTART:19700329T010000",
+    "RRULE:FREQ=YEARLY;BYMONTH=3;BYDAY=-1SU",
+    "END:DAYLIGHT",
+    "BEGIN:STANDARD",
+    "TZOFFSETFROM:+0100",
+    "TZOFFSETTO:+0000",
+    "TZNAME:GMT",
+    "DTSTART:19701025T020000",
+    "RRULE:FREQ=YEARLY;BYMONTH=10;BYDAY=-1SU",
+    "END:STANDARD",
+    "END:VTIMEZONE",
+]
+
+# Bytes every VEVENT spends besides its recurrence lines and free text: the
+# price of splitting a group into several events.
+_VEVENT_BYTES = sum(
+    len(line) + 2
+    for line in (
+        "BEGIN:VEVENT",
+        "UID:" + "0" * 40,
+        "DTSTAMP:20240101T090000Z",
+        "SUMMARY:",
+        "DTSTART;TZID=Europe/London:20240101T090000",
+        "DTEND;TZID=Europe/London:20240101T100000",
+        "LOCATION:",
+        "DESCRIPTION:",
+        "CATEGORIES:",
+        f"URL:{DASHBOARD_URL}",
+        "STATUS:CONFIRMED",
+        "TRANSP:OPAQUE",
+        "END:VEVENT",
+    )
+)
 
 
+@lru_cache(maxsize=4096)
 def _parse_date(s: str) -> date:
     return datetime.fromisoformat(s.replace("Z", "")).date()
 
 
+@lru_cache(maxsize=4096)
+def _parse_ordinal(s: str) -> int:
+    return _parse_date(s).toordinal()
+
+
+@lru_cache(maxsize=256)
 def _parse_time(s: str) -> time:
     return datetime.strptime(s, "%H:%M:%S").time()
 
@@ -29,12 +83,16 @@ def _format_local(dt: datetime) -> str:
 
 
 def _escape_text(value: str) -> str:
-    normalized = value.replace("\r\n", "\n").replace("\r", "\n")
-    escaped = normalized.replace("\\", "\\\\")
-    escaped = escaped.replace("\n", "\\n")
-    escaped = escaped.replace(",", "\\,")
-    escaped = escaped.replace(";", "\\;")
-    return escaped
+    # Chained str.replace runs in C and beats a one-pass translate()/re.sub on
+    # the short values we escape; only normalise line endings when needed.
+    if "\r" in value:
+        value = value.replace("\r\n", "\n").replace("\r", "\n")
+    return (
+        value.replace("\\", "\\\\")
+        .replace("\n", "\\n")
+        .replace(",", "\\,")
+        .replace(";", "\\;")
+    )
 
 
 # ---- Location parsing & normalization helpers ----
@@ -139,25 +197,50 @@ def _build_location_string(act: any) -> str:
 
 
 def _fold_line(line: str, limit: int = 75) -> List[str]:
-    if len(line.encode("utf-8")) <= limit:
+    if line.isascii():
+        return _fold_ascii(line, limit)
+    return [part.decode("utf-8") for part in _fold_utf8(line.encode("utf-8"), limit)]
+
+
+def _fold_ascii(line: str, limit: int) -> List[str]:
+    # One byte per character: fold by slicing. Continuation lines carry a
+    # leading space, leaving ``limit - 1`` characters of content.
+    if len(line) <= limit:
         return [line]
-    folded: List[str] = []
-    current_chars: List[str] = []
-    current_bytes = 0
-    for ch in line:
-        ch_bytes = len(ch.encode("utf-8"))
-        if current_bytes + ch_bytes > limit:
-            if current_chars:
-                folded.append("".join(current_chars))
-            current_chars = [" "]
-            current_bytes = 1
-        current_chars.append(ch)
-        current_bytes += ch_bytes
-    if current_chars:
-        folded.append("".join(current_chars))
+    step = limit - 1
+    folded = [line[:limit]]
+    folded.extend(" " + line[i : i + step] for i in range(limit, len(line), step))
     return folded
 
 
+def _fold_utf8(data: bytes, limit: int) -> List[bytes]:
+    if len(data) <= limit:
+        return [data]
+    folded: List[bytes] = []
+    pos = 0
+    room = limit
+    prefix = b""
+    while pos + room < len(data):
+        end = pos + room
+        # Never split a multi-byte sequence: back up to its lead byte.
+        while data[end] & 0xC0 == 0x80:
+            end -= 1
+        folded.append(prefix + data[pos:end])
+        pos = end
+        prefix = b" "
+        room = limit - 1
+    folded.append(prefix + data[pos:])
+    return folded
+
+
+def _line_bytes(line: str, limit: int = 75) -> bytes:
+    """Return ``line`` folded, CRLF-terminated and UTF-8 encoded."""
+
+    if line.isascii():
+        return ("\r\n".join(_fold_ascii(line, limit)) + "\r\n").encode("ascii")
+    return b"\r\n".join(_fold_utf8(line.encode("utf-8"), limit)) + b"\r\n"
+
+
 def _format_lines(lines: Iterable[str]) -> str:
     formatted: List[str] = []
     for line in lines:
@@ -167,138 +250,294 @@ def _format_lines(lines: Iterable[str]) -> str:
     return "\r\n".join(formatted) + "\r\n"
 
 
+@dataclass(frozen=True, slots=True, eq=False)
+class Event(Mapping):
+    """One VEVENT: a weekly recurring activity or a one-off blocked period.
+
+    Occurrences are kept as a week bitmask: bit ``i`` of ``weeks`` is set
+    when the event also runs ``i`` weeks after ``start`` (see
+    :mod:`hw_timetable.weeks`); ``weeks`` is 0 for one-off events. The
+    recurrence lines are derived from it on demand: an RRULE with this
+    ``interval`` plus EXDATEs, or with ``interval`` 0, RDATEs (see
+    :mod:`hw_timetable.recurrence`). Events also read like the dicts earlier
+    versions returned (``e["uid"]``, ``e.get("rrule")``, ``dict(e)``).
+    """
+
+    uid: str
+    summary: str
+    location: str
+    description: str
+    categories: str
+    transp: str
+    start: datetime
+    end: datetime
+    weeks: int = 0
+    interval: int = 1
+
+    @property
+    def rrule(self) -> Optional[str]:
+        if not (self.weeks and self.interval):
+            return None
+        last = self.start + timedelta(weeks=self.weeks.bit_length() - 1)
+        until = _format(last.astimezone(timezone.utc))
+        if self.interval == 1:
+            return f"FREQ=WEEKLY;WKST=MO;UNTIL={until}"
+        return f"FREQ=WEEKLY;INTERVAL={self.interval};WKST=MO;UNTIL={until}"
+
+    @property
+    def exdates(self) -> List[datetime]:
+        """Start times the RRULE would produce that have no class."""
+
+        return self._starts(self._exdate_weeks())
+
+    @property
+    def rdates(self) -> List[datetime]:
+        """Start times after DTSTART that are listed explicitly."""
+
+        return self._starts(self._rdate_weeks())
+
+    def _exdate_weeks(self) -> int:
+        if not (self.weeks and self.interval):
+            return 0
+        return weeks.gaps(self.weeks, self.interval)
+
+    def _rdate_weeks(self) -> int:
+        return 0 if self.interval else self.weeks & ~1
+
+    def _starts(self, mask: int) -> List[datetime]:
+        return [self.start + timedelta(weeks=i) for i in weeks.iter_weeks(mask)]
+
+    def occurrences(self) -> List[date]:
+        if not self.weeks:
+            return [self.start.date()]
+        return weeks.days(self.start.date(), self.weeks)
+
+    # Read-only mapping view, for code written against the old event dicts.
+    def __getitem__(self, key: str) -> Any:
+        if key not in EVENT_KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(EVENT_KEYS)
+
+    def __len__(self) -> int:
+        return len(EVENT_KEYS)
+
+
+EVENT_KEYS = (
+    "uid",
+    "summary",
+    "location",
+    "description",
+    "categories",
+    "transp",
+    "start",
+    "end",
+    "rrule",
+    "exdates",
+    "rdates",
+)
+
+
+class _ActivityPlan:
+    """Everything about an activity that does not depend on the week.
+
+    The teaching weeks are decoded once into bitmasks so date windows and
+    merging are integer operations; the text fields are only built for
+    activities that have at least one occurrence left. There is one pattern
+    per weekday the activity runs on, almost always just one.
+    """
+
+    __slots__ = ("act", "act_type", "patterns")
+
+    def __init__(
+        self,
+        act: ActivityLike,
+        act_type: Optional[str],
+        table: Optional[weeks.WeekTable],
+    ) -> None:
+        self.act = act
+        self.act_type = act_type
+        lo = _parse_date(act.StartDate) if act.StartDate else None
+        hi = _parse_date(act.EndDate) if act.EndDate else None
+        self.patterns = self._clip(_activity_weeks(act, table), lo, hi)
+
+    @staticmethod
+    def _clip(
+        patterns: List[weeks.Pattern], lo: Optional[date], hi: Optional[date]
+    ) -> List[weeks.Pattern]:
+        clipped = [weeks.clip(first, mask, lo, hi) for first, mask in patterns]
+        return [pattern for pattern in clipped if pattern[1]]
+
+    def occurrences(
+        self, start: Optional[date], end: Optional[date]
+    ) -> List[weeks.Pattern]:
+        return self._clip(self.patterns, start, end)
+
+    def key(self, location: str, weekday: int) -> Tuple[str, ...]:
+        act = self.act
+        return (
+            act.CourseCode,
+            act.ActivityName,
+            self.act_type,
+            location,
+            str(act.ScheduledDay),
+            act.StartTime,
+            act.EndTime,
+            act.ActivityWeekLabel,
+            # Patterns on different weekdays cannot share a weekly rule.
+            str(weekday),
+        )
+
+    def events(
+        self, location: str, pattern: weeks.Pattern, tz: ZoneInfo, recurrence: str
+    ) -> List[Event]:
+        act = self.act
+        instructors: List[str] = []
+        for ins in act.InstructorAccounts:
+            name = (
+                ins.DisplayName
+                if hasattr(ins, "DisplayName")
+                else ins.get("DisplayName", "")
+            )
+            if name:
+                instructors.append(name.strip())
+        description_parts = [
+            (
+                f"Instructor(s): {', '.join([n for n in instructors if n])}"
+                if instructors
+                else ""
+            ),
+            (f"Course: {act.CourseName}" if act.CourseName else ""),
+            (f"Group: {act.Group}" if getattr(act, "Group", None) else ""),
+            (f"Cohort: {act.Cohort}" if getattr(act, "Cohort", None) else ""),
+            (f"Week: {act.ActivityWeekLabel}" if act.ActivityWeekLabel else ""),
+            (f"Activity code: {act.ActivityName}" if act.ActivityName else ""),
+        ]
+        summary = " - ".join(
+            [part for part in (act.CourseCode, act.CourseName, self.act_type) if part]
+        )
+        description = "\n".join(filter(None, description_parts))
+        categories = self.act_type or ""
+        start_time = _parse_time(act.StartTime)
+        end_time = _parse_time(act.EndTime)
+        overhead = _VEVENT_BYTES + sum(
+            map(len, (summary, description, location, categories))
+        )
+        first_date, mask = pattern
+        events = []
+        for segment in encode_recurrence(mask, overhead=overhead, mode=recurrence):
+            day = first_date + timedelta(weeks=segment.offset)
+            uid_parts = [
+                act.CourseCode,
+                act.ActivityName,
+                str(day),
+                act.StartTime,
+                location,
+            ]
+            events.append(
+                Event(
+                    uid=hashlib.sha1("|".join(uid_parts).encode()).hexdigest(),
+                    summary=summary,
+                    location=location,
+                    description=description,
+                    categories=categories,
+                    transp="OPAQUE",
+                    start=datetime.combine(day, start_time, tz),
+                    end=datetime.combine(day, end_time, tz),
+                    weeks=segment.weeks,
+                    interval=segment.interval,
+                )
+            )
+        return events
+
+
+def _activity_weeks(
+    act: ActivityLike, table: Optional[weeks.WeekTable]
+) -> List[weeks.Pattern]:
+    """Decode the first non-empty of ``Weeks`` and ``RunningWeeks``.
+
+    Either may be a list of weeks or a bitstring; bitstrings need ``table``.
+    """
+
+    offset = act.ScheduledDay
+    for name in ("Weeks", "RunningWeeks"):
+        listed = getattr(act, name)
+        if listed:
+            return weeks.from_ordinals(
+                [
+                    _parse_ordinal(
+                        week.StartDate
+                        if hasattr(week, "StartDate")
+                        else week["StartDate"]
+                    )
+                    + offset
+                    for week in listed
+                ]
+            )
+        bits = getattr(act, name + "Bitstring", None)
+        if bits:
+            pattern = weeks.from_bitstring(bits, act.SemesterCode, table, offset)
+            if pattern[1]:
+                return [pattern]
+    return []
+
+
+class _Group:
+    """Activities that render as one event, and the weeks they run."""
+
+    __slots__ = ("plan", "location", "pattern")
+
+    def __init__(self, plan: _ActivityPlan, location: str) -> None:
+        self.plan = plan
+        self.location = location
+        self.pattern: weeks.Pattern = (date.min, 0)
+
+
 def build_events(
-    activities: Iterable[Activity],
+    activities: Iterable[ActivityLike],
     *,
     tz: ZoneInfo,
     start: Optional[date] = None,
     end: Optional[date] = None,
     filter_courses: Optional[set[str]] = None,
     filter_types: Optional[set[str]] = None,
-) -> List[dict]:
-    groups: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+    week_table: Optional[weeks.WeekTable] = None,
+    recurrence: str = "rrule",
+    metrics: MetricsLike = NULL,
+) -> List[Event]:
+    groups: Dict[Tuple[str, ...], _Group] = {}
+    occurrences = 0
     for act in activities:
         if filter_courses and act.CourseCode not in filter_courses:
             continue
         act_type = act.ActivityTypeDescription or act.Type
         if filter_types and act_type not in filter_types:
             continue
-        weeks = act.Weeks or act.RunningWeeks
-        for week in weeks:
-            start_date_str = (
-                week.StartDate if hasattr(week, "StartDate") else week["StartDate"]
-            )
-            occ_date = _parse_date(start_date_str) + timedelta(days=act.ScheduledDay)
-            if act.StartDate and occ_date < _parse_date(act.StartDate):
-                continue
-            if act.EndDate and occ_date > _parse_date(act.EndDate):
-                continue
-            if start and occ_date < start:
-                continue
-            if end and occ_date > end:
-                continue
-            location = _build_location_string(act)
-            instructors: List[str] = []
-            for ins in act.InstructorAccounts:
-                name = (
-                    ins.DisplayName
-                    if hasattr(ins, "DisplayName")
-                    else ins.get("DisplayName", "")
-                )
-                if name:
-                    instructors.append(name.strip())
-            description_parts = [
-                (
-                    f"Instructor(s): {', '.join([n for n in instructors if n])}"
-                    if instructors
-                    else ""
-                ),
-                (f"Course: {act.CourseName}" if act.CourseName else ""),
-                (f"Group: {act.Group}" if getattr(act, "Group", None) else ""),
-                (f"Cohort: {act.Cohort}" if getattr(act, "Cohort", None) else ""),
-                (f"Week: {act.ActivityWeekLabel}" if act.ActivityWeekLabel else ""),
-                (f"Activity code: {act.ActivityName}" if act.ActivityName else ""),
-            ]
-            description = "\n".join(filter(None, description_parts))
-            key = (
-                act.CourseCode,
-                act.ActivityName,
-                act_type,
-                location,
-                str(act.ScheduledDay),
-                act.StartTime,
-                act.EndTime,
-                act.ActivityWeekLabel,
-            )
-            group = groups.setdefault(
-                key,
-                {
-                    "summary": " - ".join(
-                        [
-                            part
-                            for part in (
-                                act.CourseCode,
-                                act.CourseName,
-                                act_type,
-                            )
-                            if part
-                        ]
-                    ),
-                    "location": location,
-                    "description": description,
-                    "categories": act_type or "",
-                    "transp": "OPAQUE",
-                    "dates": [],
-                    "start_time": act.StartTime,
-                    "end_time": act.EndTime,
-                    "course_code": act.CourseCode,
-                    "activity_name": act.ActivityName,
-                },
-            )
-            group["dates"].append(occ_date)
-    events: List[dict] = []
-    for group in groups.values():
-        dates = sorted(group["dates"])
-        start_time = _parse_time(group["start_time"])
-        end_time = _parse_time(group["end_time"])
-        first_date = dates[0]
-        last_date = dates[-1]
-        start_dt = datetime.combine(first_date, start_time, tz)
-        end_dt = datetime.combine(first_date, end_time, tz)
-        exdates: List[datetime] = []
-        cur = first_date
-        seen = set(dates)
-        while cur <= last_date:
-            if cur not in seen:
-                exdates.append(datetime.combine(cur, start_time, tz))
-            cur += timedelta(days=7)
-        last_start_utc = datetime.combine(last_date, start_time, tz).astimezone(
-            timezone.utc
-        )
-        rrule = f"FREQ=WEEKLY;WKST=MO;UNTIL={_format(last_start_utc)}"
-        uid_parts = [
-            group["course_code"],
-            group["activity_name"],
-            str(first_date),
-            group["start_time"],
-            group["location"],
-        ]
-        uid_base = "|".join(uid_parts)
-        uid = hashlib.sha1(uid_base.encode()).hexdigest()
-        events.append(
-            {
-                "uid": uid,
-                "summary": group["summary"],
-                "location": group["location"],
-                "description": group["description"],
-                "categories": group["categories"],
-                "transp": group["transp"],
-                "start": start_dt,
-                "end": end_dt,
-                "rrule": rrule,
-                "exdates": exdates,
-            }
-        )
+        plan = _ActivityPlan(act, act_type, week_table)
+        patterns = plan.occurrences(start, end)
+        if not patterns:
+            continue
+        location = _build_location_string(act)
+        for pattern in patterns:
+            key = plan.key(location, pattern[0].weekday())
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = _Group(plan, location)
+            group.pattern = weeks.merge(group.pattern, pattern)
+            occurrences += pattern[1].bit_count()
+    events = [
+        event
+        for group in groups.values()
+        for event in group.plan.events(group.location, group.pattern, tz, recurrence)
+    ]
+    if metrics.enabled:
+        metrics.count("groups", len(groups))
+        metrics.count("vevents", len(events))
+        metrics.count("occurrences", occurrences)
+        metrics.count("exdates", sum(e._exdate_weeks().bit_count() for e in events))
+        metrics.count("rdates", sum(e._rdate_weeks().bit_count() for e in events))
     return events
 
 
@@ -308,8 +547,8 @@ def build_blocked_events(
     tz: ZoneInfo,
     start: Optional[date] = None,
     end: Optional[date] = None,
-) -> List[dict]:
-    events: List[dict] = []
+) -> List[Event]:
+    events: List[Event] = []
     for p in periods:
         occ_date = _parse_date(p.StartDate)
         if start and occ_date < start:
@@ -321,25 +560,22 @@ def build_blocked_events(
         summary = p.Description or "Blocked out period"
         uid = hashlib.sha1(f"{summary}|{occ_date}|{p.StartTime}".encode()).hexdigest()
         events.append(
-            {
-                "uid": uid,
-                "start": start_dt,
-                "end": end_dt,
-                "summary": summary,
-                "location": "",
-                "description": summary,
-                "categories": "Blocked",
-                "transp": "TRANSPARENT",
-                "rrule": None,
-                "exdates": [],
-            }
+            Event(
+                uid=uid,
+                summary=summary,
+                location="",
+                description=summary,
+                categories="Blocked",
+                transp="TRANSPARENT",
+                start=start_dt,
+                end=end_dt,
+            )
         )
     return events
 
 
-def build_ics(
-    programme_info: dict,
-    activities: Iterable[Activity],
+def collect_events(
+    activities: Iterable[ActivityLike],
     blocked_periods: Iterable[BlockedPeriod],
     *,
     tz: ZoneInfo,
@@ -348,7 +584,10 @@ def build_ics(
     end: Optional[date] = None,
     filter_courses: Optional[set[str]] = None,
     filter_types: Optional[set[str]] = None,
-) -> Tuple[str, List[dict]]:
+    week_table: Optional[weeks.WeekTable] = None,
+    recurrence: str = "rrule",
+    metrics: MetricsLike = NULL,
+) -> List[Event]:
     events = build_events(
         activities,
         tz=tz,
@@ -356,12 +595,137 @@ def build_ics(
         end=end,
         filter_courses=filter_courses,
         filter_types=filter_types,
+        week_table=week_table,
+        recurrence=recurrence,
+        metrics=metrics,
     )
     if include_blocked:
-        events.extend(
-            build_blocked_events(blocked_periods, tz=tz, start=start, end=end)
+        blocked = build_blocked_events(blocked_periods, tz=tz, start=start, end=end)
+        metrics.count("blocked_events", len(blocked))
+        events.extend(blocked)
+    return events
+
+
+def build_ics(
+    programme_info: dict,
+    activities: Iterable[ActivityLike],
+    blocked_periods: Iterable[BlockedPeriod],
+    *,
+    tz: ZoneInfo,
+    include_blocked: bool = False,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    filter_courses: Optional[set[str]] = None,
+    filter_types: Optional[set[str]] = None,
+    reproducible: bool = False,
+    week_table: Optional[weeks.WeekTable] = None,
+    recurrence: str = "rrule",
+    metrics: MetricsLike = NULL,
+) -> Tuple[str, List[Event]]:
+    with metrics.stage("build"):
+        events = collect_events(
+            activities,
+            blocked_periods,
+            tz=tz,
+            include_blocked=include_blocked,
+            start=start,
+            end=end,
+            filter_courses=filter_courses,
+            filter_types=filter_types,
+            week_table=week_table,
+            recurrence=recurrence,
+            metrics=metrics,
         )
-    now = datetime.now(timezone.utc)
+    with metrics.stage("serialize"):
+        lines = iter_ics_lines(
+            programme_info, events, activities=activities, reproducible=reproducible
+        )
+        text = _format_lines(lines)
+    if metrics.enabled:
+        metrics.count("output_bytes", len(text.encode("utf-8")))
+    return text, events
+
+
+def write_ics(
+    stream: BinaryIO,
+    programme_info: dict,
+    events: Iterable[Event],
+    *,
+    activities: Iterable[ActivityLike] | None = None,
+    reproducible: bool = False,
+) -> int:
+    """Serialize the calendar straight to a binary ``stream``.
+
+    Lines are folded and written one at a time, so the full document never
+    exists in memory. Returns the number of bytes written.
+    """
+
+    written = 0
+    lines = iter_ics_lines(
+        programme_info, events, activities=activities, reproducible=reproducible
+    )
+    for chunk in iter_ics_chunks(lines):
+        stream.write(chunk)
+        written += len(chunk)
+    return written
+
+
+def iter_ics_chunks(lines: Iterable[str]) -> Iterator[bytes]:
+    """Yield each content line folded, CRLF-terminated and UTF-8 encoded."""
+
+    for line in lines:
+        if not line:
+            continue
+        yield _line_bytes(line)
+
+
+def iter_ics_lines(
+    programme_info: dict,
+    events: Iterable[Event],
+    *,
+    activities: Iterable[ActivityLike] | None = None,
+    reproducible: bool = False,
+) -> Iterator[str]:
+    """Yield the unfolded content lines of the calendar.
+
+    With ``reproducible`` the output depends only on the events: they are
+    emitted in a stable order and each DTSTAMP is the event's own DTSTART (in
+    UTC) rather than the wall clock, so unchanged data gives identical bytes.
+    """
+
+    yield from calendar_header_lines(programme_info, activities)
+    for e, dtstamp in stamped_events(events, reproducible):
+        yield from event_lines(e, dtstamp)
+    yield "END:VCALENDAR"
+
+
+def stamped_events(
+    events: Iterable[Event], reproducible: bool
+) -> Iterator[Tuple[Event, datetime]]:
+    """Yield events in output order, each with the DTSTAMP to render."""
+
+    if reproducible:
+        for e in sorted(events, key=_event_sort_key):
+            yield e, e.start.astimezone(timezone.utc)
+    else:
+        now = datetime.now(timezone.utc)
+        for e in events:
+            yield e, now
+
+
+def _event_sort_key(e: Event) -> Tuple[str, str, str]:
+    return (_format(e.start.astimezone(timezone.utc)), e.uid, e.summary)
+
+
+def content_etag(data: bytes) -> str:
+    """Return a strong HTTP ETag for serialized calendar ``data``."""
+
+    return f'"{hashlib.sha256(data).hexdigest()}"'
+
+
+def calendar_header_lines(
+    programme_info: dict, activities: Iterable[ActivityLike] | None
+) -> List[str]:
     calendar_name = (
         _normalize_str(
             _pick_field(
@@ -406,53 +770,55 @@ def build_ics(
         f"X-WR-CALDESC:{_escape_text(calendar_desc)}",
         "X-WR-TIMEZONE:Europe/London",
     ]
-    lines.extend(
-        [
-            "BEGIN:VTIMEZONE",
-            "TZID:Europe/London",
-            "X-LIC-LOCATION:Europe/London",
-            "BEGIN:DAYLIGHT",
-            "TZOFFSETFROM:+0000",
-            "TZOFFSETTO:+0100",
-            "TZNAME:BST",
-            "DTSTART:19700329T010000",
-            "RRULE:FREQ=YEARLY;BYMONTH=3;BYDAY=-1SU",
-            "END:DAYLIGHT",
-            "BEGIN:STANDARD",
-            "TZOFFSETFROM:+0100",
-            "TZOFFSETTO:+0000",
-            "TZNAME:GMT",
-            "DTSTART:19701025T020000",
-            "RRULE:FREQ=YEARLY;BYMONTH=10;BYDAY=-1SU",
-            "END:STANDARD",
-            "END:VTIMEZONE",
-        ]
+    lines.extend(VTIMEZONE_LINES)
+    return lines
+
+
+def event_lines(e: Event, dtstamp: Optional[datetime]) -> List[str]:
+    """Return the unfolded VEVENT lines of ``e``.
+
+    A ``dtstamp`` of ``None`` leaves out the DTSTAMP line, which is how
+    callers fingerprint an event's content.
+    """
+
+    lines = ["BEGIN:VEVENT", f"UID:{e.uid}"]
+    if dtstamp is not None:
+        lines.append(f"DTSTAMP:{_format(dtstamp)}")
+    lines += [
+        f"SUMMARY:{_escape_text(e.summary)}",
+        f"DTSTART;TZID=Europe/London:{_format_local(e.start)}",
+        f"DTEND;TZID=Europe/London:{_format_local(e.end)}",
+    ]
+    rrule = e.rrule
+    if rrule:
+        lines.append(f"RRULE:{rrule}")
+    exdates = e._exdate_weeks()
+    if exdates:
+        lines.append(f"EXDATE;TZID=Europe/London:{_local_stamps(e, exdates)}")
+    rdates = e._rdate_weeks()
+    if rdates:
+        lines.append(f"RDATE;TZID=Europe/London:{_local_stamps(e, rdates)}")
+    if e.location:
+        lines.append(f"LOCATION:{_escape_text(e.location)}")
+    if e.description:
+        lines.append(f"DESCRIPTION:{_escape_text(e.description)}")
+    if e.categories:
+        lines.append(f"CATEGORIES:{_escape_text(e.categories)}")
+    lines.append(f"URL:{DASHBOARD_URL}")
+    lines.append("STATUS:CONFIRMED")
+    lines.append(f"TRANSP:{e.transp}")
+    lines.append("END:VEVENT")
+    return lines
+
+
+def _local_stamps(e: Event, mask: int) -> str:
+    # Every listed date shares DTSTART's wall time; only the day changes.
+    first = e.start.date()
+    at = _format_local(e.start)[8:]
+    return ",".join(
+        (first + timedelta(weeks=i)).isoformat().replace("-", "") + at
+        for i in weeks.iter_weeks(mask)
     )
-    for e in events:
-        lines.append("BEGIN:VEVENT")
-        lines.append(f"UID:{e['uid']}")
-        lines.append(f"DTSTAMP:{_format(now)}")
-        lines.append(f"SUMMARY:{_escape_text(e['summary'])}")
-        lines.append(f"DTSTART;TZID=Europe/London:{_format_local(e['start'])}")
-        lines.append(f"DTEND;TZID=Europe/London:{_format_local(e['end'])}")
-        if e.get("rrule"):
-            lines.append(f"RRULE:{e['rrule']}")
-        if e.get("exdates"):
-            exdate_str = ",".join(_format_local(d) for d in e["exdates"])
-            lines.append(f"EXDATE;TZID=Europe/London:{exdate_str}")
-        if e["location"]:
-            lines.append(f"LOCATION:{_escape_text(e['location'])}")
-        if e["description"]:
-            lines.append(f"DESCRIPTION:{_escape_text(e['description'])}")
-        if e["categories"]:
-            lines.append(f"CATEGORIES:{_escape_text(e['categories'])}")
-        lines.append(f"URL:{DASHBOARD_URL}")
-        lines.append("STATUS:CONFIRMED")
-        lines.append(f"TRANSP:{e['transp']}")
-        lines.append("END:VEVENT")
-    lines.append("END:VCALENDAR")
-    ics = _format_lines(lines)
-    return ics, events
 
 
 def _pick_field(payload: dict, names: Tuple[str, ...]) -> Any:
@@ -523,7 +889,7 @@ def _coerce_semester_tokens(raw: Any) -> List[str]:
 
 def _extract_semester_label(
     programme_info: dict,
-    activities: Iterable[Activity] | None,
+    activities: Iterable[ActivityLike] | None,
 ) -> str:
     semester_source = _pick_field(
         programme_info,
@@ -551,7 +917,7 @@ def _extract_semester_label(
 def output_filename(
     programme_info: dict,
     *,
-    activities: Iterable[Activity] | None = None,
+    activities: Iterable[ActivityLike] | None = None,
 ) -> str:
     year = _extract_academic_year(programme_info)
     campus = _extract_component(
@@ -0,0 +1,148 @@
+"""Incremental calendar regeneration at the VEVENT level.
+
+Next to each calendar written this way sits ``<name>.index.json``, which maps
+every VEVENT's UID and content hash to the byte range it occupies in the
+file. On the next run, events whose UID and hash are unchanged are copied
+byte for byte from the previous file; only new or modified events are
+serialized again. The differences are written to ``<name>.changes.json`` as
+lists of added, removed and modified UIDs for downstream sync.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from . import ics_builder, util
+from .ics_builder import Event
+
+
+@dataclass
+class ChangeSummary:
+    added: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    modified: List[str] = field(default_factory=list)
+    reused: int = 0
+    rendered: int = 0
+    etag: str = ""
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.added or self.removed or self.modified)
+
+
+def event_hash(e: Event) -> str:
+    """Hash everything that reaches the VEVENT except its DTSTAMP."""
+
+    lines = ics_builder.event_lines(e, dtstamp=None)
+    return hashlib.sha1("\r\n".join(lines).encode("utf-8")).hexdigest()
+
+
+def index_path(out_path: Path) -> Path:
+    return out_path.with_name(out_path.name + ".index.json")
+
+
+def changes_path(out_path: Path) -> Path:
+    return out_path.with_name(out_path.name + ".changes.json")
+
+
+def write_changes(out_path: Path, summary: ChangeSummary) -> None:
+    changes = {k: v for k, v in asdict(summary).items() if isinstance(v, list)}
+    util.write_if_changed(
+        changes_path(out_path), json.dumps(changes, indent=2).encode("utf-8")
+    )
+
+
+def _load_previous(out_path: Path) -> Tuple[List[Dict[str, Any]], bytes]:
+    """Return the previous index entries and file, if they still agree."""
+
+    try:
+        index = json.loads(index_path(out_path).read_text(encoding="utf-8"))
+        previous = out_path.read_bytes()
+    except (OSError, ValueError):
+        return [], b""
+    if hashlib.sha256(previous).hexdigest() != index.get("sha256"):
+        logging.info("Calendar index is stale; rendering every event")
+        return [], b""
+    return index.get("events", []), previous
+
+
+def _uid_hashes(entries: Iterable[Dict[str, Any]]) -> Dict[str, Set[str]]:
+    by_uid: Dict[str, Set[str]] = {}
+    for entry in entries:
+        by_uid.setdefault(entry["uid"], set()).add(entry["hash"])
+    return by_uid
+
+
+def write_incremental(
+    out_path: Path,
+    programme_info: dict,
+    events: Iterable[Event],
+    *,
+    activities: Optional[Iterable[Any]] = None,
+    reproducible: bool = False,
+) -> ChangeSummary:
+    """Write the calendar to ``out_path``, reusing unchanged VEVENT blocks."""
+
+    old_entries, old_bytes = _load_previous(out_path)
+    spans = {
+        (entry["uid"], entry["hash"]): (entry["offset"], entry["length"])
+        for entry in old_entries
+    }
+    summary = ChangeSummary()
+    new_entries: List[Dict[str, Any]] = []
+    with util.atomic_write(out_path) as writer:
+        header = ics_builder.calendar_header_lines(programme_info, activities)
+        for chunk in ics_builder.iter_ics_chunks(header):
+            writer.write(chunk)
+        for e, dtstamp in ics_builder.stamped_events(events, reproducible):
+            digest = event_hash(e)
+            span = spans.get((e.uid, digest))
+            if span is not None:
+                offset, length = span
+                block = old_bytes[offset : offset + length]
+                summary.reused += 1
+            else:
+                lines = ics_builder.event_lines(e, dtstamp)
+                block = b"".join(ics_builder.iter_ics_chunks(lines))
+                summary.rendered += 1
+            new_entries.append(
+                {
+                    "uid": e.uid,
+                    "hash": digest,
+                    "offset": writer.size,
+                    "length": len(block),
+                }
+            )
+            writer.write(block)
+        for chunk in ics_builder.iter_ics_chunks(["END:VCALENDAR"]):
+            writer.write(chunk)
+
+    summary.etag = writer.etag
+    old_by_uid = _uid_hashes(old_entries)
+    new_by_uid = _uid_hashes(new_entries)
+    summary.added = sorted(new_by_uid.keys() - old_by_uid.keys())
+    summary.removed = sorted(old_by_uid.keys() - new_by_uid.keys())
+    summary.modified = sorted(
+        uid
+        for uid in new_by_uid.keys() & old_by_uid.keys()
+        if new_by_uid[uid] != old_by_uid[uid]
+    )
+    index = {"sha256": writer.digest.hexdigest(), "events": new_entries}
+    util.write_if_changed(
+        index_path(out_path), json.dumps(index, indent=1).encode("utf-8")
+    )
+    write_changes(out_path, summary)
+    logging.info(
+        "Calendar events: %d added, %d removed, %d modified (%d reused, %d rendered)",
+        len(summary.added),
+        len(summary.removed),
+        len(summary.modified),
+        summary.reused,
+        summary.rendered,
+    )
+    return summary
@@ -0,0 +1,103 @@
+"""Build manifests used to skip work when nothing has changed.
+
+A manifest records the SHA-256 of every endpoint payload a run consumed, the
+options that shape the output, and the calendar that was produced. Manifests
+live in ``<out dir>/manifests``, one per option set and user.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from . import util
+
+MANIFEST_DIR = Path("out/manifests")
+
+
+def payload_hashes(payloads: Any, endpoints: Iterable[str]) -> Dict[str, str]:
+    return {e: hashlib.sha256(payloads.raw(e)).hexdigest() for e in endpoints}
+
+
+def consumed_endpoints(
+    previous: Optional[Dict[str, Any]], required: Iterable[str]
+) -> List[str]:
+    """Return ``required`` plus any endpoint the previous build also consumed."""
+
+    recorded = previous.get("payloads", {}) if previous else {}
+    return list(dict.fromkeys([*required, *recorded]))
+
+
+def user_identity(token: Optional[str], profile: Optional[str]) -> Optional[str]:
+    """Return who a run is for without the token itself.
+
+    Tokens rotate, so keying manifests or cached responses on them would
+    start afresh with every new token. The JWT subject is stable; opaque
+    tokens fall back to the token profile they came from, and only a token
+    from no profile (a batch entry's own ``token``) is identified by itself.
+    """
+
+    if not token:
+        return None
+    from . import auth
+
+    subject = auth.token_subject(token)
+    if subject:
+        return subject
+    if profile:
+        return f"profile:{profile}"
+    return "token:" + hashlib.sha256(token.encode()).hexdigest()[:16]
+
+
+def manifest_path(
+    options: Dict[str, Any], user: Optional[str], directory: Path = MANIFEST_DIR
+) -> Path:
+    identity = json.dumps({"options": options, "user": user}, sort_keys=True)
+    return directory / f"{hashlib.sha256(identity.encode()).hexdigest()[:16]}.json"
+
+
+def load(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def is_current(
+    previous: Optional[Dict[str, Any]],
+    options: Dict[str, Any],
+    hashes: Dict[str, str],
+) -> bool:
+    """Return True if ``previous`` was built from these inputs and still exists."""
+
+    if not previous:
+        return False
+    if previous.get("options") != options or previous.get("payloads") != hashes:
+        return False
+    output = previous.get("output")
+    if not output or not Path(output).exists():
+        return False
+    return util.file_digest(Path(output)) == previous.get("output_sha256")
+
+
+def save(
+    path: Path,
+    options: Dict[str, Any],
+    hashes: Dict[str, str],
+    output: Path,
+) -> None:
+    data = {
+        "options": options,
+        "payloads": hashes,
+        "output": str(output),
+        "output_sha256": util.file_digest(output),
+    }
+    try:
+        util.write_if_changed(
+            path, json.dumps(data, indent=2, sort_keys=True).encode("utf-8")
+        )
+    except OSError as exc:  # pragma: no cover - disk issues are rare
+        logging.warning("Failed to write build manifest: %s", exc)
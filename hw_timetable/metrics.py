@@ -0,0 +1,74 @@
+"""Stage timers and counters for ``--timings`` / ``--metrics-json``.
+
+Instrumented code takes a ``metrics`` argument that defaults to :data:`NULL`,
+whose methods do nothing, so runs without the flags pay only for a method
+call per stage. Counters that would need extra work to compute are guarded
+by ``metrics.enabled``.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, ContextManager, Dict, Iterator, Union
+
+
+class Metrics:
+    enabled = True
+
+    def __init__(self) -> None:
+        self.stages: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Add the wall time spent inside the block to stage ``name``."""
+
+        began = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - began
+            with self._lock:
+                self.stages[name] = self.stages.get(name, 0.0) + elapsed
+
+    def count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "stages_s": {k: round(v, 6) for k, v in self.stages.items()},
+                "counters": dict(self.counters),
+            }
+
+    def report(self) -> str:
+        data = self.as_dict()
+        lines = ["Timings:"]
+        for name, seconds in data["stages_s"].items():
+            lines.append(f"  {name:<20}{seconds * 1000:>10.1f} ms")
+        if data["counters"]:
+            lines.append("Counters:")
+            for name, value in data["counters"].items():
+                lines.append(f"  {name:<20}{value:>10}")
+        return "\n".join(lines)
+
+
+class NullMetrics:
+    """Stand-in used when metrics are off; every call is a no-op."""
+
+    enabled = False
+    _context = nullcontext()
+
+    def stage(self, name: str) -> ContextManager[None]:
+        return self._context
+
+    def count(self, name: str, amount: int = 1) -> None:
+        pass
+
+
+NULL = NullMetrics()
+MetricsLike = Union[Metrics, NullMetrics]
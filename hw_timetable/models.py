@@ -1,14 +1,21 @@
 from __future__ import annotations
 
-from typing import List, Optional
+import json
+from dataclasses import dataclass, field, fields
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Union
 
 from pydantic import (
     BaseModel,
     ConfigDict,
     Field,
+    TypeAdapter,
     field_validator,
+    model_validator,
 )
 
+from .weeks import parse_bitstring
+
 
 class Week(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -50,6 +57,10 @@ class Activity(BaseModel):
 
     Weeks: List[Week] = Field(default_factory=list)
     RunningWeeks: List[Week] = Field(default_factory=list)
+    # Weeks sent as bitstrings ("0111...", first character = week 1 of the
+    # semester) are kept here; see hw_timetable.weeks.
+    WeeksBitstring: Optional[str] = None
+    RunningWeeksBitstring: Optional[str] = None
 
     ScheduledDay: int = 0
     StartDate: Optional[str] = None
@@ -60,14 +71,28 @@ class Activity(BaseModel):
 
     ActivityWeekLabel: Optional[str] = ""
 
+    @model_validator(mode="before")
+    @classmethod
+    def _split_bitstrings(cls, data: Any) -> Any:
+        if isinstance(data, dict):
+            for name in ("Weeks", "RunningWeeks"):
+                if isinstance(data.get(name), str):
+                    data = {**data, name: [], name + "Bitstring": data[name]}
+        return data
+
     @field_validator("Weeks", "RunningWeeks", mode="before")
     @classmethod
     def _coerce_week_lists(cls, value):
-        # Normalize null/empty values and bitstring encodings.
+        # Normalize null/empty values.
         if value in (None, ""):
             return []
-        if isinstance(value, str):
-            return []
+        return value
+
+    @field_validator("WeeksBitstring", "RunningWeeksBitstring")
+    @classmethod
+    def _check_bitstring(cls, value: Optional[str]) -> Optional[str]:
+        if value is not None:
+            parse_bitstring(value)
         return value
 
 
@@ -79,3 +104,73 @@ class BlockedPeriod(BaseModel):
     EndDate: str
     StartTime: str
     EndTime: str
+
+
+@dataclass(slots=True)
+class ActivityRecord:
+    """Unvalidated activity row for trusted payloads.
+
+    Mirrors :class:`Activity` field for field, but nested weeks, locations and
+    instructors stay as the decoded dicts, which ``build_events`` accepts.
+    """
+
+    CourseCode: str
+    CourseName: str
+    StartTime: str
+    EndTime: str
+    ActivityName: Optional[str] = None
+    ActivityTypeDescription: Optional[str] = None
+    Type: Optional[str] = None
+    Group: Optional[str] = None
+    Cohort: Optional[str] = None
+    ProgrammeCodes: List[str] = field(default_factory=list)
+    SemesterCode: Optional[str] = None
+    Weeks: List[Dict[str, Any]] = field(default_factory=list)
+    RunningWeeks: List[Dict[str, Any]] = field(default_factory=list)
+    WeeksBitstring: Optional[str] = None
+    RunningWeeksBitstring: Optional[str] = None
+    ScheduledDay: int = 0
+    StartDate: Optional[str] = None
+    EndDate: Optional[str] = None
+    Locations: List[Dict[str, Any]] = field(default_factory=list)
+    InstructorAccounts: List[Dict[str, Any]] = field(default_factory=list)
+    ActivityWeekLabel: Optional[str] = ""
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ActivityRecord":
+        record = cls(**{k: v for k, v in data.items() if k in _RECORD_FIELDS})
+        for name in ("Weeks", "RunningWeeks"):
+            value = getattr(record, name)
+            if isinstance(value, str):
+                setattr(record, name + "Bitstring", value)
+            if not isinstance(value, list):
+                setattr(record, name, [])
+        for name in ("Locations", "InstructorAccounts", "ProgrammeCodes"):
+            if getattr(record, name) is None:
+                setattr(record, name, [])
+        if record.ScheduledDay is None:
+            record.ScheduledDay = 0
+        return record
+
+
+_RECORD_FIELDS = frozenset(f.name for f in fields(ActivityRecord))
+
+ActivityLike = Union[Activity, ActivityRecord]
+
+
+@lru_cache(maxsize=None)
+def _activity_list_adapter() -> TypeAdapter:
+    return TypeAdapter(List[Activity])
+
+
+def parse_activities(raw: bytes, *, trusted: bool = False) -> List[ActivityLike]:
+    """Turn an ``/activity/activities`` body into activities in one pass.
+
+    By default the whole list is validated strictly by pydantic straight from
+    the JSON bytes. ``trusted`` skips validation and builds lightweight
+    :class:`ActivityRecord` objects instead.
+    """
+
+    if trusted:
+        return [ActivityRecord.from_dict(item) for item in json.loads(raw)]
+    return _activity_list_adapter().validate_json(raw)
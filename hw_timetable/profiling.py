@@ -0,0 +1,131 @@
+"""cProfile and tracemalloc hooks for ``--profile`` / ``--profile-memory``.
+
+:class:`ProfilingMetrics` is a :class:`~hw_timetable.metrics.Metrics` whose
+pipeline stages (fetch, validate, build, write) also run under cProfile
+and/or tracemalloc, so profiles line up with the ``--timings`` report.
+cProfile only sees the calling thread; the concurrent HTTP workers of the
+fetch stage show up as time spent waiting on them.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import io
+import pstats
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .metrics import Metrics
+
+PROFILED_STAGES = ("fetch", "validate", "build", "write")
+
+
+@dataclass
+class MemoryStage:
+    """Allocations of one stage, relative to the memory in use when it began."""
+
+    name: str
+    peak: int
+    net: int
+    top: List[str]
+
+
+class ProfilingMetrics(Metrics):
+    def __init__(
+        self,
+        *,
+        cpu_profile: Optional[Path] = None,
+        memory: bool = False,
+        top: int = 20,
+    ) -> None:
+        super().__init__()
+        self.cpu_profile = cpu_profile
+        self.top = top
+        self.profiler = cProfile.Profile() if cpu_profile else None
+        self.memory = memory
+        self.memory_stages: List[MemoryStage] = []
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        with super().stage(name):
+            if name not in PROFILED_STAGES:
+                yield
+                return
+            before = self._memory_start() if self.memory else None
+            if self.profiler is not None:
+                self.profiler.enable()
+            try:
+                yield
+            finally:
+                if self.profiler is not None:
+                    self.profiler.disable()
+                if before is not None:
+                    self._memory_end(name, before)
+
+    def _memory_start(self) -> Tuple[tracemalloc.Snapshot, int]:
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        return snapshot, tracemalloc.get_traced_memory()[0]
+
+    def _memory_end(self, name: str, before: Tuple[tracemalloc.Snapshot, int]) -> None:
+        snapshot, base = before
+        current, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+        # Dropping our own frames from the grouped diff is far cheaper than
+        # Snapshot.filter_traces over every trace.
+        ignored = {tracemalloc.__file__, __file__}
+        growth = [
+            d
+            for d in after.compare_to(snapshot, "lineno")
+            if d.traceback[0].filename not in ignored
+        ]
+        growth.sort(key=lambda d: d.size_diff, reverse=True)
+        self.memory_stages.append(
+            MemoryStage(
+                name=name,
+                peak=peak - base,
+                net=current - base,
+                top=[str(d) for d in growth[: self.top] if d.size_diff > 0],
+            )
+        )
+
+    def as_dict(self) -> Dict[str, Any]:
+        data = super().as_dict()
+        if self.memory:
+            data["memory"] = {
+                s.name: {"peak_bytes": s.peak, "net_bytes": s.net, "top": s.top}
+                for s in self.memory_stages
+            }
+        if self.cpu_profile:
+            data["cpu_profile"] = str(self.cpu_profile)
+        return data
+
+    def finish(self) -> str:
+        """Stop tracing, save the ``.pstats`` file and return the summaries."""
+
+        sections = []
+        if self.profiler is not None and self.cpu_profile is not None:
+            self.cpu_profile.parent.mkdir(parents=True, exist_ok=True)
+            self.profiler.dump_stats(str(self.cpu_profile))
+            buffer = io.StringIO()
+            stats = pstats.Stats(self.profiler, stream=buffer)
+            stats.sort_stats("cumulative").print_stats(self.top)
+            sections.append(f"CPU profile saved to {self.cpu_profile}")
+            sections.append(buffer.getvalue().strip())
+        if self.memory:
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+            lines = ["Memory by stage:"]
+            for s in self.memory_stages:
+                lines.append(
+                    f"  {s.name:<10} peak {s.peak / 1024:>10.1f} KiB"
+                    f"  net {s.net / 1024:>+10.1f} KiB"
+                )
+                lines.extend(f"      {entry}" for entry in s.top)
+            sections.append("\n".join(lines))
+        return "\n\n".join(sections)
@@ -0,0 +1,127 @@
+"""Pick the smallest RRULE/EXDATE/RDATE encoding of a week pattern.
+
+A group's teaching weeks (a mask, see :mod:`hw_timetable.weeks`) can be
+written in several equivalent ways: one weekly RRULE with an EXDATE per
+missing week, an ``INTERVAL=k`` rule for fortnightly (or sparser) patterns,
+an explicit RDATE list, or several VEVENTs split at long gaps, each encoded
+on its own. :func:`encode` estimates the serialized size of each option and
+returns the cheapest partition; expanding the chosen segments always gives
+back exactly the input weeks.
+
+Modes:
+
+``rrule`` (default)
+    Intervals and splits, but no RDATE: some clients drop RDATE occurrences
+    on import, so it is only used when asked for.
+``compact``
+    Every encoding above.
+``weekly``
+    One ``FREQ=WEEKLY`` rule from the first to the last week with EXDATEs,
+    as earlier versions wrote.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Tuple
+
+from . import weeks
+
+MODES = ("rrule", "compact", "weekly")
+MAX_INTERVAL = 4
+
+# An RRULE line (CRLF included), and the heads of the EXDATE/RDATE lines
+# that list one local stamp plus a comma per week.
+_RRULE = len("RRULE:FREQ=WEEKLY;WKST=MO;UNTIL=20240101T090000Z\r\n")
+_INTERVAL = len(";INTERVAL=2")
+_EXDATE = len("EXDATE;TZID=Europe/London:")
+_RDATE = len("RDATE;TZID=Europe/London:")
+_STAMP = len("20240101T090000,")
+
+
+@dataclass(frozen=True)
+class Segment:
+    """One VEVENT's share of a pattern.
+
+    ``offset`` is the segment's first week relative to the pattern's first
+    week and ``weeks`` its own mask (bit 0 always set). ``interval`` is the
+    RRULE ``INTERVAL``; 0 means no RRULE, with any further weeks as RDATEs.
+    """
+
+    offset: int
+    weeks: int
+    interval: int
+
+
+def _folded(chars: int) -> int:
+    """Bytes of a content line of ``chars`` characters (CRLF included)."""
+
+    return chars + 2 + 3 * max(0, -(-(chars - 75) // 74))
+
+
+def _list_cost(head: int, count: int) -> int:
+    return _folded(head + _STAMP * count - 1) if count else 0
+
+
+@lru_cache(maxsize=4096)
+def _segment_cost(mask: int, rdate: bool) -> Tuple[int, int]:
+    """Return ``(bytes, interval)`` of the cheapest single-VEVENT encoding."""
+
+    count = mask.bit_count()
+    if count == 1:
+        return 0, 0
+    length = mask.bit_length()
+    best = (_list_cost(_RDATE, count - 1), 0) if rdate else None
+    for interval in range(1, MAX_INTERVAL + 1):
+        lattice = weeks.stride(interval, length)
+        if mask & ~lattice:
+            continue
+        cost = _RRULE + (_INTERVAL if interval > 1 else 0)
+        cost += _list_cost(_EXDATE, (lattice & ~mask).bit_count())
+        if best is None or cost < best[0]:
+            best = (cost, interval)
+    assert best is not None  # interval 1 always fits
+    return best
+
+
+def encode(mask: int, *, overhead: int, mode: str = "rrule") -> List[Segment]:
+    """Split ``mask`` into the segments that serialize to the fewest bytes.
+
+    ``overhead`` is the size of the lines every extra VEVENT repeats (UID,
+    SUMMARY, DESCRIPTION, ...), the price of a split.
+    """
+
+    if mode == "weekly":
+        return [Segment(0, mask, 1)]
+    rdate = mode == "compact"
+    whole, interval = _segment_cost(mask, rdate)
+    if whole <= overhead:
+        # Any split costs at least one more VEVENT, so none can be cheaper.
+        return [Segment(0, mask, interval)]
+    positions = list(weeks.iter_weeks(mask))
+    count = len(positions)
+    # best[j]: cheapest encoding of the first j weeks; cut[j]: where its last
+    # segment starts.
+    best = [0] + [-1] * count
+    cut = [0] * (count + 1)
+    for i in range(count):
+        base = best[i] + (overhead if i else 0)
+        segment = 0
+        for j in range(i, count):
+            segment |= 1 << (positions[j] - positions[i])
+            cost = base + _segment_cost(segment, rdate)[0]
+            if best[j + 1] < 0 or cost < best[j + 1]:
+                best[j + 1], cut[j + 1] = cost, i
+    segments: List[Segment] = []
+    end = count
+    while end:
+        start = cut[end]
+        offset = positions[start]
+        segment = 0
+        for position in positions[start:end]:
+            segment |= 1 << (position - offset)
+        segments.append(Segment(offset, segment, _segment_cost(segment, rdate)[1]))
+        end = start
+    segments.reverse()
+    return segments
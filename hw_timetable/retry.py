@@ -0,0 +1,113 @@
+"""Retry and backoff policy for API requests."""
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import FrozenSet, Optional
+
+RETRY_STATUSES: FrozenSet[int] = frozenset({429, 500, 502, 503, 504})
+
+
+def parse_retry_after(
+    value: Optional[str], now: Optional[float] = None
+) -> Optional[float]:
+    """Return the delay in seconds requested by a ``Retry-After`` header.
+
+    Both the delta-seconds and the HTTP-date forms are accepted; anything
+    unparseable is ignored.
+    """
+
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    now = time.time() if now is None else now
+    return max(0.0, when.timestamp() - now)
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, bounded by time budgets.
+
+    ``attempts`` caps the requests sent per endpoint. ``request_budget`` caps
+    the seconds one endpoint may spend including its retries, and
+    ``run_budget`` caps the whole run for every client sharing this policy.
+    Sleeps wait on an event, so :meth:`cancel` wakes every sleeping worker
+    and stops further retries.
+    """
+
+    def __init__(
+        self,
+        *,
+        attempts: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        request_budget: Optional[float] = 60.0,
+        run_budget: Optional[float] = None,
+        timeout: float = 30.0,
+        retry_statuses: FrozenSet[int] = RETRY_STATUSES,
+        rng: Optional[random.Random] = None,
+    ) -> None:
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.request_budget = request_budget
+        self.run_deadline = (
+            None if run_budget is None else time.monotonic() + run_budget
+        )
+        self.timeout = timeout
+        self.retry_statuses = retry_statuses
+        self.rng = rng or random.Random()
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def deadline(self) -> Optional[float]:
+        """Return the monotonic deadline for a request starting now."""
+
+        deadline = self.run_deadline
+        if self.request_budget is not None:
+            own = time.monotonic() + self.request_budget
+            deadline = own if deadline is None else min(deadline, own)
+        return deadline
+
+    def request_timeout(self, deadline: Optional[float]) -> float:
+        """Per-call socket timeout that never outlives ``deadline``."""
+
+        if deadline is None:
+            return self.timeout
+        return max(0.1, min(self.timeout, deadline - time.monotonic()))
+
+    def backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Delay before retry number ``attempt + 1``.
+
+        A server-supplied ``Retry-After`` wins; otherwise the delay is drawn
+        uniformly from ``[0, min(max_delay, base_delay * 2**attempt)]`` so
+        workers that failed together do not retry together.
+        """
+
+        requested = parse_retry_after(retry_after)
+        if requested is not None:
+            return requested
+        return self.rng.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+    def wait(self, delay: float, deadline: Optional[float]) -> bool:
+        """Sleep ``delay`` seconds; False if the budget or a cancel forbids it."""
+
+        if self.cancelled:
+            return False
+        if deadline is not None and time.monotonic() + delay > deadline:
+            return False
+        return not self._cancelled.wait(delay)
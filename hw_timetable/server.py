@@ -0,0 +1,341 @@
+"""Long-running ICS subscription feed server.
+
+``--serve`` keeps the validated timetable in memory, refreshes it from the API
+in a background thread, and answers feed requests from an in-memory render
+cache::
+
+    GET /calendar.ics?course=F29AI&course=F29SO&type=Lecture,Lab&blocked=1
+        &start=2024-01-08&end=2024-04-26
+
+Every query parameter is optional and defaults to the CLI options the server
+was started with. Responses carry a strong ETag (so ``If-None-Match`` polls
+get ``304 Not Modified``) and are gzip-compressed for clients that accept it.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import io
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from . import api, ics_builder, models, util, weeks
+
+FEED_PATHS = ("/", "/calendar.ics")
+RENDER_CACHE_SIZE = 64
+
+
+@dataclass
+class Snapshot:
+    programme_info: dict
+    activities: List[Any]
+    blocked_periods: List[models.BlockedPeriod]
+    fingerprint: str
+    refreshed_at: float
+    week_table: Optional[weeks.WeekTable] = None
+
+
+@dataclass
+class Rendered:
+    body: bytes
+    etag: str
+    gzip_body: bytes
+
+    @property
+    def gzip_etag(self) -> str:
+        # Each encoding of the feed is a distinct representation.
+        return self.etag[:-1] + '-gzip"'
+
+
+FeedKey = Tuple[Tuple[str, ...], Tuple[str, ...], bool, Optional[str], Optional[str]]
+
+
+class FeedStore:
+    """Validated timetable data plus a bounded cache of rendered feeds."""
+
+    def __init__(self, client: api.APIClient, args: argparse.Namespace) -> None:
+        self.client = client
+        self.args = args
+        self.tz = util.parse_timezone(args.tz)
+        self._snapshot: Optional[Snapshot] = None
+        self._renders: OrderedDict[FeedKey, Rendered] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def snapshot(self) -> Optional[Snapshot]:
+        return self._snapshot
+
+    def refresh(self) -> bool:
+        """Fetch and validate the timetable; return True if it changed."""
+
+        from . import cli
+
+        payloads = api.Payloads(self.client)
+        current = self._snapshot
+        # Blocked periods are always loaded: feeds can toggle them per request.
+        endpoints = [
+            "/Student/programme-info",
+            "/activity/activities",
+            "/activity/blocked-out-periods",
+        ]
+        # Once activities use bitstring weeks, the semester table that anchors
+        # them is an input too.
+        uses_semesters = current is not None and current.week_table is not None
+        if self.args.only_current_semester or uses_semesters:
+            endpoints.append("/systemadmin/semesters")
+        payloads.prefetch(endpoints)
+        digest = hashlib.sha256()
+        for endpoint in endpoints:
+            digest.update(payloads.raw(endpoint))
+        if self.args.only_current_semester:
+            # The selected semester depends on the day the refresh happens.
+            digest.update(util.today().isoformat().encode())
+        fingerprint = digest.hexdigest()
+        if current is not None and current.fingerprint == fingerprint:
+            current.refreshed_at = time.time()
+            return False
+
+        activities = models.parse_activities(
+            payloads.raw("/activity/activities"), trusted=self.args.trusted_input
+        )
+        if self.args.only_current_semester:
+            activities = cli.current_semester_activities(
+                activities, payloads["/systemadmin/semesters"]
+            )
+        blocked = [
+            models.BlockedPeriod.model_validate(b)
+            for b in payloads["/activity/blocked-out-periods"]
+        ]
+        week_table = None
+        if weeks.uses_bitstrings(activities):
+            week_table = weeks.WeekTable.from_semesters(
+                payloads["/systemadmin/semesters"]
+            )
+        snapshot = Snapshot(
+            programme_info=payloads["/Student/programme-info"],
+            activities=activities,
+            blocked_periods=blocked,
+            fingerprint=fingerprint,
+            refreshed_at=time.time(),
+            week_table=week_table,
+        )
+        with self._lock:
+            self._snapshot = snapshot
+            self._renders.clear()
+        logging.info("Timetable refreshed: %d activities", len(activities))
+        return True
+
+    def default_key(self) -> FeedKey:
+        args = self.args
+        return (
+            tuple(sorted(args.filter_course or [])),
+            tuple(sorted(args.filter_type.split(","))) if args.filter_type else (),
+            bool(args.include_blocked),
+            args.start,
+            args.end,
+        )
+
+    def key_for_query(self, query: Dict[str, List[str]]) -> FeedKey:
+        courses, types, blocked, start, end = self.default_key()
+        if "course" in query:
+            courses = tuple(sorted({c for v in query["course"] for c in v.split(",")}))
+        if "type" in query:
+            types = tuple(sorted({t for v in query["type"] for t in v.split(",")}))
+        if "blocked" in query:
+            blocked = query["blocked"][-1].lower() in ("1", "true", "yes")
+        for name in ("start", "end"):
+            if name in query:
+                value = query[name][-1]
+                date.fromisoformat(value)  # reject malformed dates early
+                if name == "start":
+                    start = value
+                else:
+                    end = value
+        return courses, types, blocked, start, end
+
+    def render(self, key: FeedKey) -> Rendered:
+        with self._lock:
+            snapshot = self._snapshot
+            cached = self._renders.get(key)
+            if cached is not None:
+                self._renders.move_to_end(key)
+                return cached
+        if snapshot is None:
+            raise RuntimeError("Timetable not loaded yet")
+        courses, types, blocked, start, end = key
+        events = ics_builder.collect_events(
+            snapshot.activities,
+            snapshot.blocked_periods,
+            tz=self.tz,
+            include_blocked=blocked,
+            start=date.fromisoformat(start) if start else None,
+            end=date.fromisoformat(end) if end else None,
+            filter_courses=set(courses) or None,
+            filter_types=set(types) or None,
+            week_table=snapshot.week_table,
+            recurrence=self.args.recurrence,
+        )
+        buffer = io.BytesIO()
+        ics_builder.write_ics(
+            buffer,
+            snapshot.programme_info,
+            events,
+            activities=snapshot.activities,
+            reproducible=True,
+        )
+        body = buffer.getvalue()
+        rendered = Rendered(
+            body=body,
+            etag=ics_builder.content_etag(body),
+            gzip_body=gzip.compress(body, mtime=0),
+        )
+        with self._lock:
+            if self._snapshot is snapshot:
+                self._renders[key] = rendered
+                while len(self._renders) > RENDER_CACHE_SIZE:
+                    self._renders.popitem(last=False)
+        return rendered
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """Return True if an ``Accept-Encoding`` header allows a gzip body.
+
+    Codings are weighed by their ``q`` value: ``gzip;q=0`` refuses gzip, and
+    ``*`` covers gzip when it is not listed itself.
+    """
+
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, *params = (part.strip() for part in item.split(";"))
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding.lower()] = q
+    for coding in ("gzip", "x-gzip", "*"):
+        if coding in weights:
+            return weights[coding] > 0
+    return False
+
+
+class FeedHandler(BaseHTTPRequestHandler):
+    server_version = "hw-timetable-feed"
+    store: FeedStore
+
+    def log_message(self, fmt: str, *args: Any) -> None:
+        logging.debug("%s - %s", self.address_string(), fmt % args)
+
+    def do_HEAD(self) -> None:
+        self._serve(send_body=False)
+
+    def do_GET(self) -> None:
+        self._serve(send_body=True)
+
+    def _plain(self, status: int, message: str, send_body: bool = True) -> None:
+        body = (message + "\n").encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def _serve(self, *, send_body: bool) -> None:
+        url = urlsplit(self.path)
+        if url.path == "/healthz":
+            snapshot = self.store.snapshot
+            if snapshot is None:
+                return self._plain(503, "loading", send_body)
+            age = int(time.time() - snapshot.refreshed_at)
+            return self._plain(200, f"ok, refreshed {age}s ago", send_body)
+        if url.path not in FEED_PATHS:
+            return self._plain(404, "not found", send_body)
+        try:
+            key = self.store.key_for_query(parse_qs(url.query))
+        except ValueError as exc:
+            return self._plain(400, f"bad query: {exc}", send_body)
+        try:
+            rendered = self.store.render(key)
+        except RuntimeError as exc:
+            return self._plain(503, str(exc), send_body)
+
+        use_gzip = accepts_gzip(self.headers.get("Accept-Encoding", ""))
+        body, etag = rendered.body, rendered.etag
+        if use_gzip:
+            body, etag = rendered.gzip_body, rendered.gzip_etag
+        if_none_match = self.headers.get("If-None-Match", "")
+        if etag in (tag.strip() for tag in if_none_match.split(",")):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Vary", "Accept-Encoding")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/calendar; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Vary", "Accept-Encoding")
+        self.send_header("Cache-Control", "no-cache")
+        if use_gzip:
+            self.send_header("Content-Encoding", "gzip")
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+
+def make_server(store: FeedStore, host: str, port: int) -> ThreadingHTTPServer:
+    handler = type("BoundFeedHandler", (FeedHandler,), {"store": store})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def start_refresher(
+    store: FeedStore, interval: float, stop: threading.Event
+) -> threading.Thread:
+    """Refresh ``store`` every ``interval`` seconds until ``stop`` is set."""
+
+    def loop() -> None:
+        while not stop.wait(interval):
+            try:
+                store.refresh()
+            except Exception as exc:
+                # Keep serving the last good snapshot.
+                logging.warning("Background refresh failed: %s", exc)
+
+    thread = threading.Thread(target=loop, name="feed-refresh", daemon=True)
+    thread.start()
+    return thread
+
+
+def serve(args: argparse.Namespace) -> None:
+    from . import cli
+
+    store = FeedStore(cli.make_client(args), args)
+    store.refresh()
+    stop = threading.Event()
+    start_refresher(store, args.refresh_interval, stop)
+    httpd = make_server(store, args.host, args.port)
+    host, port = httpd.server_address[:2]
+    logging.info("Serving timetable feed on http://%s:%s/calendar.ics", host, port)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        store.client.retry.cancel()
+        httpd.server_close()
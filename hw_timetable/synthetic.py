@@ -0,0 +1,170 @@
+"""Deterministic synthetic timetable payloads.
+
+The generators return decoded JSON in the shape the API serves (plain dicts
+and lists matching :class:`~hw_timetable.models.Activity` and
+:class:`~hw_timetable.models.BlockedPeriod`), so every pipeline stage from
+``json.loads`` onwards can be exercised at any scale. The same arguments and
+``seed`` always give the same payloads.
+"""
+
+from __future__ import annotations
+
+import json
+import random
+from datetime import date, timedelta
+from typing import Any, Dict, List
+
+SEMESTER_START = date(2023, 9, 4)  # a Monday
+ACTIVITY_TYPES = ["Lecture", "Lab", "Tutorial", "Workshop"]
+BUILDINGS = ["Earl Mountbatten", "James Watt Centre", "Edwin Chadwick", "Mary Burton"]
+
+
+def _week_pattern(rng: random.Random, weeks: int, weeks_per_activity: int) -> List[int]:
+    """Pick the teaching weeks (0-based) of one activity.
+
+    Mixes the shapes real timetables have: contiguous runs, fortnightly
+    labs, two blocks split by a reading week, and scattered weeks.
+    """
+
+    count = max(1, min(weeks, weeks_per_activity))
+    shape = rng.random()
+    if shape < 0.5:
+        first = rng.randrange(weeks - count + 1)
+        return list(range(first, first + count))
+    if shape < 0.7:
+        first = rng.randrange(2)
+        return list(range(first, weeks, 2))[:count]
+    if shape < 0.85:
+        gap = rng.randrange(1, max(2, weeks - count + 1))
+        split = rng.randrange(1, count) if count > 1 else 1
+        return [w for w in range(weeks) if w < split or split + gap <= w][:count]
+    return sorted(rng.sample(range(weeks), count))
+
+
+def activities(
+    count: int,
+    *,
+    weeks: int = 12,
+    weeks_per_activity: int = 10,
+    locations: int = 1,
+    instructors: int = 1,
+    courses: int | None = None,
+    semester_start: date = SEMESTER_START,
+    seed: int = 0,
+) -> List[Dict[str, Any]]:
+    """Return ``count`` activity rows spread over ``courses`` courses."""
+
+    rng = random.Random(seed)
+    courses = courses or max(1, count // 8)
+    week_starts = [
+        (semester_start + timedelta(weeks=n)).isoformat() for n in range(weeks)
+    ]
+    rows = []
+    for i in range(count):
+        course = rng.randrange(courses)
+        code = f"F{20 + course % 10}{chr(65 + course // 10 % 26)}{course // 260:02d}"
+        act_type = rng.choice(ACTIVITY_TYPES)
+        hour = 9 + rng.randrange(8)
+        pattern = _week_pattern(rng, weeks, weeks_per_activity)
+        rows.append(
+            {
+                "CourseCode": code,
+                "CourseName": f"Synthetic Course {course}",
+                "ActivityName": f"{code}/{act_type[:3].upper()}/{i:05d}",
+                "ActivityTypeDescription": act_type,
+                "Type": act_type,
+                "Group": f"Group {rng.randrange(1, 6)}" if act_type == "Lab" else None,
+                "Cohort": None,
+                "ProgrammeCodes": [f"F2{rng.randrange(10)}-CS"],
+                "SemesterCode": "S1",
+                "StartTime": f"{hour:02d}:00:00",
+                "EndTime": f"{hour + 1 + (act_type == 'Lab'):02d}:00:00",
+                "Weeks": [
+                    {"WeekNumber": w + 1, "StartDate": week_starts[w]} for w in pattern
+                ],
+                "RunningWeeks": [],
+                "ScheduledDay": rng.randrange(5),
+                "Locations": [
+                    {
+                        "Building": rng.choice(BUILDINGS),
+                        "Room": f"{rng.randrange(4)}.{rng.randrange(1, 40):02d}",
+                    }
+                    for _ in range(locations)
+                ],
+                "InstructorAccounts": [
+                    {
+                        "DisplayName": f"Lecturer {rng.randrange(200)}",
+                        "Email": f"lecturer{rng.randrange(200)}@hw.ac.uk",
+                    }
+                    for _ in range(instructors)
+                ],
+                "ActivityWeekLabel": ",".join(str(w + 1) for w in pattern),
+            }
+        )
+    return rows
+
+
+def blocked_periods(
+    count: int, *, semester_start: date = SEMESTER_START, seed: int = 0
+) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        day = semester_start + timedelta(days=rng.randrange(7 * 15))
+        hour = 9 + rng.randrange(8)
+        rows.append(
+            {
+                "Description": f"Blocked period {i}",
+                "StartDate": day.isoformat(),
+                "EndDate": day.isoformat(),
+                "StartTime": f"{hour:02d}:00:00",
+                "EndTime": f"{hour + 1:02d}:00:00",
+            }
+        )
+    return rows
+
+
+def programme_info() -> Dict[str, Any]:
+    return {
+        "AcademicYear": "2023/4",
+        "CampusCode": "EDI",
+        "Cohort": "1",
+        "Semesters": ["S1"],
+    }
+
+
+def semesters(
+    *, weeks: int = 12, semester_start: date = SEMESTER_START
+) -> List[Dict[str, Any]]:
+    end = semester_start + timedelta(weeks=weeks, days=-3)
+    return [
+        {
+            "Code": "S1",
+            "StartDate": semester_start.isoformat(),
+            "EndDate": end.isoformat(),
+        }
+    ]
+
+
+def payloads(
+    count: int, *, blocked: int = 20, seed: int = 0, **options: Any
+) -> Dict[str, bytes]:
+    """Return encoded response bodies keyed by API endpoint.
+
+    ``options`` are passed on to :func:`activities`.
+    """
+
+    weeks = options.get("weeks", 12)
+    start = options.get("semester_start", SEMESTER_START)
+    decoded = {
+        "/Student/programme-info": programme_info(),
+        "/systemadmin/semesters": semesters(weeks=weeks, semester_start=start),
+        "/activity/activities": activities(count, seed=seed, **options),
+        "/activity/blocked-out-periods": blocked_periods(
+            blocked, semester_start=start, seed=seed
+        ),
+        "/activity/ad-hoc": [],
+    }
+    return {
+        endpoint: json.dumps(body).encode("utf-8") for endpoint, body in decoded.items()
+    }
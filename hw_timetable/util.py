@@ -3,7 +3,12 @@
 from __future__ import annotations
 
 import logging
+import os
+import tempfile
+from contextlib import contextmanager
 from datetime import date
+from pathlib import Path
+from typing import Any, BinaryIO, Iterator
 from zoneinfo import ZoneInfo
 
 
@@ -18,3 +23,142 @@ def parse_timezone(tz: str) -> ZoneInfo:
 
 def today() -> date:
     return date.today()
+
+
+class HashingWriter:
+    """Binary stream wrapper that SHA-256 hashes everything written to it."""
+
+    def __init__(self, stream: BinaryIO) -> None:
+        import hashlib
+
+        self.stream = stream
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.changed = True
+
+    def write(self, data: bytes) -> Any:
+        self.digest.update(data)
+        self.size += len(data)
+        return self.stream.write(data)
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.digest.hexdigest()}"'
+
+
+def file_digest(path: Path) -> str | None:
+    """Return the SHA-256 hex digest of ``path``, or ``None`` if unreadable."""
+
+    import hashlib
+
+    try:
+        with path.open("rb") as f:
+            return hashlib.file_digest(f, "sha256").hexdigest()
+    except OSError:
+        return None
+
+
+def _read_umask() -> int:
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+# There is no way to read the umask without setting it, which would race with
+# files other threads create; read it once at import, before any threads.
+_UMASK = _read_umask()
+
+
+@contextmanager
+def atomic_write(path: Path, mode: int | None = None) -> Iterator[HashingWriter]:
+    """Stream into a temp file beside ``path`` and rename it into place.
+
+    Readers never observe a partial file. If the new content is identical to
+    what ``path`` already holds, the file is left untouched and the writer's
+    ``changed`` flag is cleared. The file gets ``mode``, or by default the
+    permissions a plain ``open()`` would give it (``0o666`` minus the umask)
+    rather than the ``0o600`` of the temp file.
+    """
+
+    if mode is None:
+        mode = 0o666 & ~_UMASK
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(
+        dir=path.parent, prefix=f".{path.name}.", suffix=".tmp"
+    )
+    tmp = Path(tmp_name)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            if hasattr(os, "fchmod"):
+                os.fchmod(fd, mode)
+            else:  # pragma: no cover - Windows only has the read-only bit
+                os.chmod(tmp, mode)
+            writer = HashingWriter(f)
+            yield writer
+        if file_digest(path) == writer.digest.hexdigest():
+            writer.changed = False
+            tmp.unlink()
+        else:
+            os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def write_if_changed(path: Path, data: bytes, mode: int | None = None) -> bool:
+    """Atomically write ``data`` unless ``path`` already holds exactly it."""
+
+    try:
+        if path.read_bytes() == data:
+            return False
+    except OSError:
+        pass
+    with atomic_write(path, mode) as f:
+        f.write(data)
+    return True
+
+
+@contextmanager
+def file_lock(path: Path, lock_dir: Path | None = None) -> Iterator[None]:
+    """Hold an exclusive cross-process lock for ``path``.
+
+    The lock lives in a ``<name>.lock`` file next to ``path``, or in
+    ``lock_dir`` when ``path`` sits in a published directory (``flock`` on
+    POSIX, ``msvcrt.locking`` on Windows). Lock files are left in place:
+    removing one while another process waits on it would break exclusion.
+    """
+
+    if lock_dir is None:
+        lock_path = path.with_name(path.name + ".lock")
+    else:
+        import hashlib
+
+        # Calendars of the same name in different directories lock separately.
+        where = hashlib.sha256(str(path.resolve()).encode()).hexdigest()[:12]
+        lock_path = lock_dir / f"{path.name}.{where}.lock"
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, "a+b") as f:
+        if os.name == "nt":  # pragma: no cover - exercised on Windows only
+            import msvcrt
+            import time
+
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.05)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,185 @@
+"""Teaching weeks as integer bitmasks.
+
+A week pattern is a ``(first, mask)`` pair: bit ``i`` of ``mask`` is set when
+the activity runs on ``first + i weeks``. Patterns arrive either as lists of
+week start dates or as bitstrings such as ``"0111101111"``, whose first
+character is the first week of the activity's semester; :class:`WeekTable`
+anchors those to dates using ``/systemadmin/semesters``. Set operations on
+weeks (merging groups, date windows, EXDATE gaps) are then plain integer
+arithmetic.
+"""
+
+from __future__ import annotations
+
+import logging
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+Pattern = Tuple[date, int]
+
+
+def _parse_day(value: str) -> date:
+    return date.fromisoformat(value[:10])
+
+
+class WeekTable:
+    """Monday of week 1 of each semester, keyed by semester code."""
+
+    def __init__(self, starts: Dict[str, date]) -> None:
+        self.starts = starts
+
+    @classmethod
+    def from_semesters(cls, semesters: Iterable[Dict[str, Any]]) -> "WeekTable":
+        starts: Dict[str, date] = {}
+        for sem in semesters or []:
+            code = sem.get("Code") or sem.get("SemesterCode")
+            if not code or not sem.get("StartDate"):
+                continue
+            first = _parse_day(sem["StartDate"])
+            starts[code] = first - timedelta(days=first.weekday())
+        return cls(starts)
+
+    def week_one(self, semester: Optional[str]) -> Optional[date]:
+        """Return the Monday bit 0 of ``semester``'s bitstrings refers to.
+
+        With a single known semester, activities without a (known) code are
+        assumed to belong to it.
+        """
+
+        if semester in self.starts:
+            return self.starts[semester]
+        if len(self.starts) == 1:
+            return next(iter(self.starts.values()))
+        return None
+
+
+def uses_bitstrings(activities: Iterable[Any]) -> bool:
+    """Return True if any activity needs a :class:`WeekTable` to be placed."""
+
+    return any(
+        getattr(act, "WeeksBitstring", None)
+        or getattr(act, "RunningWeeksBitstring", None)
+        for act in activities
+    )
+
+
+def parse_bitstring(value: str) -> int:
+    """Return the mask of a ``"0110..."`` pattern (first character is bit 0)."""
+
+    bits = "".join(value.split())
+    if bits.strip("01"):
+        raise ValueError(f"Week pattern must contain only 0 and 1: {value!r}")
+    return int(bits[::-1], 2) if bits else 0
+
+
+def from_dates(days: Iterable[date]) -> List[Pattern]:
+    """Return the patterns holding ``days``, one per weekday, earliest first."""
+
+    return from_ordinals([d.toordinal() for d in days])
+
+
+def from_ordinals(ordinals: List[int]) -> List[Pattern]:
+    """Return the patterns holding the day ``ordinals``, earliest first.
+
+    Dates a whole number of weeks apart share a pattern; a date off that
+    lattice (a class moved to another weekday) starts a pattern of its own
+    rather than being rounded onto a week it does not run in.
+    """
+
+    if not ordinals:
+        return []
+    first = min(ordinals)
+    if all((ordinal - first) % 7 == 0 for ordinal in ordinals):
+        return [_lattice(ordinals)]
+    by_weekday: Dict[int, List[int]] = {}
+    for ordinal in ordinals:
+        by_weekday.setdefault(ordinal % 7, []).append(ordinal)
+    return sorted(_lattice(group) for group in by_weekday.values())
+
+
+def _lattice(ordinals: List[int]) -> Pattern:
+    if not ordinals:
+        return date.min, 0
+    first = min(ordinals)
+    mask = 0
+    for ordinal in ordinals:
+        mask |= 1 << ((ordinal - first) // 7)
+    return date.fromordinal(first), mask
+
+
+def from_bitstring(
+    value: str, semester: Optional[str], table: Optional[WeekTable], offset: int
+) -> Pattern:
+    """Anchor a bitstring to its semester; ``offset`` is the day of the week."""
+
+    mask = parse_bitstring(value)
+    week_one = table.week_one(semester) if table is not None else None
+    if week_one is None:
+        if mask:
+            logging.warning(
+                "No week table for semester %r; dropping week pattern %s",
+                semester,
+                value,
+            )
+        return date.min, 0
+    return normalize(week_one + timedelta(days=offset), mask)
+
+
+def normalize(first: date, mask: int) -> Pattern:
+    """Re-anchor ``first`` on the earliest week that is set."""
+
+    if not mask:
+        return first, 0
+    shift = (mask & -mask).bit_length() - 1
+    return first + timedelta(weeks=shift), mask >> shift
+
+
+def clip(first: date, mask: int, lo: Optional[date], hi: Optional[date]) -> Pattern:
+    """Drop the weeks outside ``[lo, hi]``."""
+
+    if hi is not None:
+        if hi < first:
+            return first, 0
+        mask &= (1 << ((hi - first).days // 7 + 1)) - 1
+    if lo is not None and lo > first:
+        skip = -(-(lo - first).days // 7)
+        first, mask = first + timedelta(weeks=skip), mask >> skip
+    return normalize(first, mask)
+
+
+def merge(a: Pattern, b: Pattern) -> Pattern:
+    """Union of two patterns on the same weekday."""
+
+    if not b[1]:
+        return a
+    if not a[1]:
+        return b
+    if b[0] < a[0]:
+        a, b = b, a
+    return a[0], a[1] | b[1] << ((b[0] - a[0]).days // 7)
+
+
+def iter_weeks(mask: int) -> Iterator[int]:
+    """Yield the indices of the set bits, lowest first."""
+
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def stride(interval: int, length: int) -> int:
+    """Return the mask of every ``interval``-th week below ``length``."""
+
+    count = -(-length // interval)
+    return ((1 << (interval * count)) - 1) // ((1 << interval) - 1)
+
+
+def gaps(mask: int, interval: int = 1) -> int:
+    """Return the clear weeks of an ``interval``-weekly rule spanning ``mask``."""
+
+    return stride(interval, mask.bit_length()) & ~mask
+
+
+def days(first: date, mask: int) -> List[date]:
+    return [first + timedelta(weeks=i) for i in iter_weeks(mask)]
@@ -0,0 +1,77 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+
+PROGRAMME_INFO = {
+    "AcademicYear": "2023/4",
+    "CampusCode": "SCO",
+    "Cohort": "1",
+    "Semesters": ["S1"],
+}
+
+
+def write_fixtures(out_dir: Path) -> Path:
+    """Write the offline JSON snapshot of one lecture under ``out_dir``."""
+
+    json_dir = out_dir / "json"
+    json_dir.mkdir(parents=True)
+    (out_dir / "ics").mkdir(parents=True)
+    payloads = {
+        "Student_programme-info.json": PROGRAMME_INFO,
+        "systemadmin_semesters.json": [
+            {"Code": "S1", "StartDate": "2023-09-04", "EndDate": "2023-12-15"}
+        ],
+        "activity_activities.json": [
+            {
+                "CourseCode": "ABC",
+                "CourseName": "Course",
+                "ActivityName": "Lec",
+                "ActivityTypeDescription": "Lecture",
+                "Type": "Lecture",
+                "Group": None,
+                "Cohort": None,
+                "ProgrammeCodes": ["PC"],
+                "SemesterCode": "S1",
+                "StartTime": "09:00:00",
+                "EndTime": "10:00:00",
+                "Weeks": [{"WeekNumber": 1, "StartDate": "2023-09-04"}],
+                "RunningWeeks": [],
+                "ScheduledDay": 0,
+                "Locations": [{"Building": "B", "Room": "1"}],
+                "InstructorAccounts": [],
+                "ActivityWeekLabel": "Week",
+            }
+        ],
+        "activity_blocked-out-periods.json": [],
+        "activity_ad-hoc.json": [],
+    }
+    for name, payload in payloads.items():
+        (json_dir / name).write_text(json.dumps(payload), encoding="utf-8")
+    return out_dir
+
+
+@pytest.fixture
+def offline_out(tmp_path):
+    """The default ``out`` tree of :func:`run_cli`, holding the fixtures."""
+
+    return write_fixtures(tmp_path / "out")
+
+
+@pytest.fixture
+def run_cli(tmp_path):
+    """Run ``python -m hw_timetable.cli`` in ``tmp_path`` instead of the repo."""
+
+    path = [str(ROOT), os.environ.get("PYTHONPATH", "")]
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, path)))
+
+    def run(*args, **kwargs):
+        command = [sys.executable, "-m", "hw_timetable.cli", *args]
+        return subprocess.run(command, cwd=tmp_path, env=env, check=True, **kwargs)
+
+    return run
@@ -0,0 +1,190 @@
+import base64
+import json
+import threading
+import time
+
+import requests
+
+from hw_timetable import api
+
+
+class FakeResponse:
+    def __init__(self, status_code, payload=None, headers=None):
+        self.status_code = status_code
+        self.content = json.dumps(payload).encode() if payload is not None else b""
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error")
+
+
+class SlowSession:
+    def __init__(self, delay=0.2):
+        self.delay = delay
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def get(self, url, headers=None, timeout=None):
+        with self.lock:
+            self.calls.append((url, dict(headers or {})))
+        time.sleep(self.delay)
+        if headers.get("Authorization") == "Bearer stale":
+            return FakeResponse(401)
+        return FakeResponse(200, {"url": url})
+
+
+def test_get_many_runs_requests_concurrently(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    client = api.APIClient("tok", use_cache=False)
+    client.session = SlowSession()
+    began = time.perf_counter()
+    payloads = client.get_many(api.ENDPOINTS)
+    elapsed = time.perf_counter() - began
+    assert list(payloads) == api.ENDPOINTS
+    assert payloads["/activity/activities"] == {
+        "url": api.BASE_URL + "/activity/activities"
+    }
+    assert elapsed < 0.2 * len(api.ENDPOINTS) / 2
+
+
+def test_get_many_refreshes_expired_token_once(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    from hw_timetable import auth
+
+    refreshes = []
+
+    def fake_acquire_token(**kwargs):
+        refreshes.append(kwargs)
+        return "fresh"
+
+    monkeypatch.setattr(auth, "acquire_token", fake_acquire_token)
+    client = api.APIClient("stale", use_cache=False)
+    client.session = SlowSession(delay=0.05)
+    payloads = client.get_many(api.ENDPOINTS)
+    assert len(payloads) == len(api.ENDPOINTS)
+    assert len(refreshes) == 1
+    assert client.token == "fresh"
+
+
+class ConditionalSession:
+    def __init__(self):
+        self.calls = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.calls.append(dict(headers or {}))
+        if headers.get("If-None-Match") == '"v1"':
+            return FakeResponse(304, headers={"ETag": '"v1"'})
+        return FakeResponse(200, [{"id": 1}], headers={"ETag": '"v1"'})
+
+
+def test_cached_response_is_revalidated_and_reused(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    session = ConditionalSession()
+    first = api.APIClient("tok", cache_ttl=0)
+    first.session = session
+    assert first.get("/activity/activities") == [{"id": 1}]
+    assert "If-None-Match" not in session.calls[0]
+
+    second = api.APIClient("tok", cache_ttl=0)
+    second.session = session
+    assert second.get("/activity/activities") == [{"id": 1}]
+    assert session.calls[1]["If-None-Match"] == '"v1"'
+
+
+def test_rotated_tokens_of_one_user_share_the_cache(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    def jwt(**claims):
+        body = base64.urlsafe_b64encode(json.dumps(claims).encode()).decode()
+        return f"e30.{body.rstrip('=')}.sig"
+
+    session = ConditionalSession()
+    for expiry in (1e10, 2e10):
+        client = api.APIClient(jwt(sub="alice", exp=expiry), cache_ttl=0)
+        client.session = session
+        assert client.get("/activity/activities") == [{"id": 1}]
+    assert session.calls[1]["If-None-Match"] == '"v1"'
+    assert len(list((tmp_path / "out/cache").iterdir())) == 1
+
+    bob = api.APIClient(jwt(sub="bob", exp=1e10), cache_ttl=0)
+    bob.session = session
+    bob.get("/activity/activities")
+    assert "If-None-Match" not in session.calls[2]
+
+
+def test_fresh_cache_entry_skips_the_request(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    session = ConditionalSession()
+    for _ in range(3):
+        client = api.APIClient("tok", cache_ttl=60)
+        client.session = session
+        assert client.get("/activity/activities") == [{"id": 1}]
+    assert len(session.calls) == 1
+
+    other = api.APIClient("other-token", cache_ttl=60, token_profile="work")
+    other.session = session
+    other.get("/activity/activities")
+    assert len(session.calls) == 2
+
+
+def test_shared_memo_coalesces_concurrent_requests(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    from concurrent.futures import ThreadPoolExecutor
+
+    from hw_timetable import cache
+
+    memo = cache.ResponseMemo(ttl=60)
+    session = SlowSession(delay=0.1)
+    clients = [api.APIClient("tok", use_cache=False, memo=memo) for _ in range(4)]
+    for client in clients:
+        client.session = session
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        bodies = list(pool.map(lambda c: c.get("/activity/activities"), clients))
+    assert len(session.calls) == 1
+    assert all(body == bodies[0] for body in bodies)
+    assert memo.stats()["misses"] == 1
+    assert memo.stats()["coalesced"] == 3
+
+    clients[0].get("/activity/activities")
+    assert memo.stats()["hits"] == 1
+    other = api.APIClient(
+        "other-token", use_cache=False, memo=memo, token_profile="work"
+    )
+    other.session = session
+    other.get("/activity/activities")
+    assert len(session.calls) == 2
+
+
+def test_memo_does_not_keep_failures():
+    from hw_timetable import cache
+
+    memo = cache.ResponseMemo(ttl=60)
+    calls = []
+
+    def failing():
+        calls.append(1)
+        raise RuntimeError("boom")
+
+    for _ in range(2):
+        try:
+            memo.get("key", failing)
+        except RuntimeError:
+            pass
+    assert len(calls) == 2
+    assert memo.get("key", lambda: b"ok") == b"ok"
+    assert memo.get("key", failing) == b"ok"
+
+
+def test_memo_is_bounded_and_expires(monkeypatch):
+    from hw_timetable import cache
+
+    memo = cache.ResponseMemo(ttl=10, max_entries=2)
+    for key in ("a", "b", "c"):
+        memo.get(key, lambda: key.encode())
+    assert memo.stats()["entries"] == 2
+    assert memo.get("a", lambda: b"refetched") == b"refetched"
+
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 11)
+    assert memo.get("a", lambda: b"expired") == b"expired"
@@ -0,0 +1,108 @@
+import base64
+import json
+import os
+import stat
+import time
+
+import pytest
+
+from hw_timetable import api, auth, batch
+
+
+def make_jwt(**claims):
+    def part(data):
+        raw = json.dumps(data).encode()
+        return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+    return f"{part({'alg': 'none'})}.{part(claims)}.sig"
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(auth, "TOKEN_CACHE_PATH", tmp_path / "token.txt")
+    monkeypatch.delenv("HW_TIMETABLE_ACCESS_TOKEN", raising=False)
+    return auth.TokenStore(tmp_path / "tokens.json")
+
+
+def test_expiry_is_read_from_the_jwt():
+    live = make_jwt(exp=time.time() + 3600)
+    dead = make_jwt(exp=time.time() - 10)
+    assert not auth.is_expired(live)
+    assert auth.is_expired(dead)
+    assert not auth.is_expired("opaque-token")
+    assert auth.token_expiry("a.%%%.c") is None
+
+
+def test_expired_candidates_are_skipped(store):
+    live = make_jwt(exp=time.time() + 3600, preferred_username="alice@hw.ac.uk")
+    store.save(live)
+    dead = make_jwt(exp=time.time() - 10)
+    assert auth.acquire_token(explicit_token=dead, store=store) == live
+
+    store.save(dead)
+    with pytest.raises(auth.TokenExpiredError, match="expired at"):
+        auth.acquire_token(store=store)
+
+
+def test_profiles_keep_tokens_and_metadata_apart(store):
+    work = make_jwt(exp=time.time() + 3600, preferred_username="alice@hw.ac.uk")
+    auth.acquire_token(explicit_token=f"Bearer {work}", profile="work", store=store)
+    auth.acquire_token(explicit_token="plain", store=store)
+    assert store.profiles() == ["default", "work"]
+
+    saved = store.load("work")
+    assert saved.token == work
+    assert saved.subject == "alice@hw.ac.uk"
+    assert saved.source == "argument"
+    assert saved.expires_at == pytest.approx(auth.token_expiry(work))
+    assert auth.acquire_token(profile="work", store=store) == work
+    assert store.load("default").token == "plain"
+    if os.name != "nt":
+        assert stat.S_IMODE(store.path.stat().st_mode) == 0o600
+
+
+def test_client_rejects_expired_token_without_a_request(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    class NoNetwork:
+        def get(self, *args, **kwargs):
+            raise AssertionError("no request expected")
+
+    client = api.APIClient(
+        make_jwt(exp=time.time() - 10), use_cache=False, refresh_token=False
+    )
+    client.session = NoNetwork()
+    with pytest.raises(auth.TokenExpiredError):
+        client.get("/activity/activities")
+
+
+def test_401_with_no_newer_token_is_not_retried(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(auth, "acquire_token", lambda **kwargs: "same")
+    calls = []
+
+    class Rejecting:
+        def get(self, url, headers=None, timeout=None):
+            calls.append(headers)
+
+            class Response:
+                status_code = 401
+                headers = {}
+
+            return Response()
+
+    client = api.APIClient("same", use_cache=False)
+    client.session = Rejecting()
+    with pytest.raises(RuntimeError, match="no newer token"):
+        client.get("/activity/activities")
+    assert len(calls) == 1
+
+
+def test_batch_entries_can_use_stored_profiles(store):
+    store.save(make_jwt(exp=time.time() + 3600), profile="bob")
+    store.save(make_jwt(exp=time.time() - 10), profile="carol")
+    assert batch.entry_token({"profile": "bob"}, store) == store.load("bob").token
+    with pytest.raises(auth.TokenExpiredError, match="carol"):
+        batch.entry_token({"profile": "carol"}, store)
+    with pytest.raises(RuntimeError, match="No stored token"):
+        batch.entry_token({"profile": "dave"}, store)
@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+from hw_timetable import batch, cli
+
+ACTIVITY = {
+    "CourseCode": "ABC",
+    "CourseName": "Course",
+    "ActivityName": "Lec",
+    "ActivityTypeDescription": "Lecture",
+    "StartTime": "09:00:00",
+    "EndTime": "10:00:00",
+    "Weeks": [{"WeekNumber": 1, "StartDate": "2023-09-04"}],
+    "Locations": [{"Building": "B", "Room": "1"}],
+}
+
+
+class FakeResponse:
+    def __init__(self, status_code, payload=None):
+        self.status_code = status_code
+        self.content = json.dumps(payload).encode()
+        self.headers = {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"{self.status_code} error")
+
+
+class TokenCheckingSession:
+    def __init__(self):
+        self.calls = 0
+
+    def get(self, url, headers=None, timeout=None):
+        self.calls += 1
+        if headers.get("Authorization") != "Bearer good":
+            return FakeResponse(401)
+        if url.endswith("/Student/programme-info"):
+            return FakeResponse(200, {"AcademicYear": "2023/4", "Cohort": "1"})
+        return FakeResponse(200, [ACTIVITY])
+
+
+def test_bad_token_does_not_abort_batch(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    entries = [
+        {"name": "alice", "token": "Bearer good", "filter_type": ["Lecture"]},
+        {"name": "bob", "token": "expired"},
+        {"name": "carol", "token": "good", "output": "carol-s1.ics"},
+        {"name": "dave"},
+    ]
+    session = TokenCheckingSession()
+    base = cli.parse_args(["--no-cache"])
+    results = batch.run_batch(entries, base, workers=2, session=session)
+
+    assert [r.name for r in results] == ["alice", "bob", "carol", "dave"]
+    assert [r.ok for r in results] == [True, False, True, False]
+    assert "rejected" in results[1].error
+    assert results[0].output.resolve() == tmp_path / "out/ics/alice.ics"
+    assert (tmp_path / "out/ics/carol-s1.ics").read_bytes().count(b"BEGIN:VEVENT") == 1
+
+
+def test_batch_rejects_a_shared_caldav_collection(capsys):
+    with pytest.raises(SystemExit):
+        cli.parse_args(["--batch", "students.json", "--caldav-url", "http://dav/"])
+    assert "--caldav-url" in capsys.readouterr().err
+
+
+def test_outputs_must_be_distinct_file_names(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    entries = [
+        {"name": "alice", "token": "good"},
+        {"name": "bob", "token": "good", "output": "Alice.ics"},
+        {"name": "carol", "token": "good", "output": "../carol.ics"},
+        {"name": "dave", "token": "good", "output": str(tmp_path / "dave.ics")},
+        {"name": "../erin", "token": "good"},
+    ]
+    base = cli.parse_args(["--no-cache"])
+    results = batch.run_batch(entries, base, session=TokenCheckingSession())
+
+    assert [r.ok for r in results] == [True, False, False, False, False]
+    assert "already written by entry 'alice'" in results[1].error
+    assert all("must be a file name" in r.error for r in results[2:])
+    assert [p.name for p in (tmp_path / "out/ics").glob("*.ics")] == ["alice.ics"]
+    assert not (tmp_path / "carol.ics").exists()
+    assert not (tmp_path / "dave.ics").exists()
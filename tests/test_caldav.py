@@ -0,0 +1,116 @@
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from hw_timetable import caldav, ics_builder, models
+from hw_timetable.util import parse_timezone
+
+
+class FakeCalDAVHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _check_preconditions(self):
+        current = self.server.resources.get(self.path)
+        etag = current[1] if current else None
+        if self.headers.get("If-None-Match") == "*" and current:
+            return False
+        if_match = self.headers.get("If-Match")
+        return not (if_match and if_match != etag)
+
+    def _reply(self, status, etag=None):
+        self.send_response(status)
+        if etag:
+            self.send_header("ETag", etag)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_PUT(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        with self.server.lock:
+            self.server.log.append(("PUT", self.path))
+            if not self._check_preconditions():
+                return self._reply(412)
+            etag = '"%s"' % hashlib.md5(body).hexdigest()
+            created = self.path not in self.server.resources
+            self.server.resources[self.path] = (body, etag)
+        self._reply(201 if created else 204, etag)
+
+    def do_DELETE(self):
+        with self.server.lock:
+            self.server.log.append(("DELETE", self.path))
+            if self.path not in self.server.resources:
+                return self._reply(404)
+            if not self._check_preconditions():
+                return self._reply(412)
+            del self.server.resources[self.path]
+        self._reply(204)
+
+    def do_HEAD(self):
+        current = self.server.resources.get(self.path)
+        self._reply(200 if current else 404, current[1] if current else None)
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), FakeCalDAVHandler)
+    httpd.resources = {}
+    httpd.log = []
+    httpd.lock = threading.Lock()
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def make_events(*codes, room="1"):
+    activities = [
+        models.Activity(
+            CourseCode=code,
+            CourseName="Course",
+            ActivityName="Lec",
+            StartTime="09:00:00",
+            EndTime="10:00:00",
+            Weeks=[models.Week(WeekNumber=1, StartDate="2023-09-04")],
+            InstructorAccounts=[{"DisplayName": f"Room {room}"}],
+        )
+        for code in codes
+    ]
+    return ics_builder.build_events(activities, tz=parse_timezone("Europe/London"))
+
+
+def test_sync_pushes_only_changes(server, tmp_path):
+    url = f"http://127.0.0.1:{server.server_port}/cal/"
+    sink = caldav.CalDAVSink(
+        url, state_path=tmp_path / "state.json", session=requests.Session()
+    )
+    first = sink.sync(make_events("AAA", "BBB"))
+    assert len(first.created) == 2 and first.ok
+    assert len(server.resources) == 2
+    body = next(iter(server.resources.values()))[0]
+    assert body.startswith(b"BEGIN:VCALENDAR\r\n") and b"BEGIN:VEVENT" in body
+
+    server.log.clear()
+    again = sink.sync(make_events("AAA", "BBB"))
+    assert again.unchanged == 2 and server.log == []
+
+    changed = make_events("AAA", room="2")
+    third = sink.sync(changed)
+    assert third.updated == [changed[0]["uid"]]
+    assert len(third.deleted) == 1
+    assert sorted(method for method, _ in server.log) == ["DELETE", "PUT"]
+    assert len(server.resources) == 1
+
+
+def test_lost_state_recovers_from_conflicts(server, tmp_path):
+    url = f"http://127.0.0.1:{server.server_port}/cal"
+    events = make_events("AAA")
+    caldav.CalDAVSink(url, state_path=tmp_path / "a.json").sync(events)
+    fresh = caldav.CalDAVSink(url, state_path=tmp_path / "b.json")
+    result = fresh.sync(make_events("AAA", room="2"))
+    assert result.ok and result.created == [events[0]["uid"]]
+    assert server.log.count(("PUT", f"/cal/{events[0]['uid']}.ics")) == 3
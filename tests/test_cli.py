@@ -0,0 +1,45 @@
+from hw_timetable import api, cli
+
+
+def test_default_run_only_needs_programme_and_activities():
+    args = cli.parse_args([])
+    assert cli.required_endpoints(args) == [
+        "/Student/programme-info",
+        "/activity/activities",
+    ]
+
+
+def test_options_pull_in_their_endpoints():
+    args = cli.parse_args(["--include-blocked", "--only-current-semester"])
+    assert "/activity/blocked-out-periods" in cli.required_endpoints(args)
+    assert "/systemadmin/semesters" in cli.required_endpoints(args)
+    assert "/activity/ad-hoc" not in cli.required_endpoints(args)
+
+
+def test_dump_json_forces_full_snapshot():
+    args = cli.parse_args(["--dump-json"])
+    assert cli.required_endpoints(args) == api.ENDPOINTS
+
+
+class RecordingClient:
+    def __init__(self):
+        self.requested = []
+
+    def get_bytes(self, endpoint):
+        self.requested.append(endpoint)
+        return f'"{endpoint}"'.encode()
+
+    def get_many(self, endpoints, raw=False):
+        assert raw
+        return {e: self.get_bytes(e) for e in endpoints}
+
+
+def test_payloads_fetch_lazily_and_once():
+    client = RecordingClient()
+    payloads = api.Payloads(client)
+    payloads.prefetch(["/activity/activities"])
+    assert payloads["/activity/activities"] == "/activity/activities"
+    assert "/systemadmin/semesters" not in payloads
+    assert payloads["/systemadmin/semesters"] == "/systemadmin/semesters"
+    payloads["/systemadmin/semesters"]
+    assert client.requested == ["/activity/activities", "/systemadmin/semesters"]
@@ -0,0 +1,63 @@
+import dataclasses
+from datetime import date
+
+import pytest
+
+from hw_timetable import ics_builder, models
+from hw_timetable.util import parse_timezone
+
+TZ = parse_timezone("Europe/London")
+
+
+def make_activity(*starts):
+    return models.Activity(
+        CourseCode="ABC",
+        CourseName="C",
+        ActivityName="Lec",
+        StartTime="09:00:00",
+        EndTime="10:00:00",
+        Weeks=[models.Week(StartDate=s) for s in starts],
+        ScheduledDay=1,
+    )
+
+
+def test_events_store_occurrences_as_a_week_mask():
+    (event,) = ics_builder.build_events(
+        [make_activity("2023-10-16", "2023-10-02", "2023-10-02", "2023-10-30")],
+        tz=TZ,
+        recurrence="weekly",
+    )
+    assert event.weeks == 0b10101
+    assert event.occurrences() == [
+        date(2023, 10, 3),
+        date(2023, 10, 17),
+        date(2023, 10, 31),
+    ]
+    assert [d.date() for d in event.exdates] == [date(2023, 10, 10), date(2023, 10, 24)]
+    assert event.rrule == "FREQ=WEEKLY;WKST=MO;UNTIL=20231031T090000Z"
+    assert not hasattr(event, "__dict__")
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        event.summary = "changed"
+
+
+def test_events_still_read_like_dicts():
+    (event,) = ics_builder.build_events([make_activity("2023-10-02")], tz=TZ)
+    (blocked,) = ics_builder.build_blocked_events(
+        [
+            models.BlockedPeriod(
+                StartDate="2023-10-04",
+                EndDate="2023-10-04",
+                StartTime="12:00:00",
+                EndTime="13:00:00",
+            )
+        ],
+        tz=TZ,
+    )
+    as_dict = dict(event)
+    assert list(as_dict) == list(ics_builder.EVENT_KEYS)
+    assert event["uid"] == event.uid and event["start"] == event.start
+    assert event.get("exdates") == [] and "rrule" in event
+    assert event.get("dates") is None and "dates" not in event
+    assert blocked["rrule"] is None and blocked.occurrences() == [date(2023, 10, 4)]
+    with pytest.raises(KeyError):
+        event["nope"]
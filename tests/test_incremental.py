@@ -0,0 +1,79 @@
+import io
+import json
+
+from hw_timetable import ics_builder, incremental, models
+from hw_timetable.util import parse_timezone
+
+PROGRAMME_INFO = {"AcademicYear": "2023/4", "Semesters": ["S1"]}
+
+
+def make_activity(code, **overrides):
+    base = dict(
+        CourseCode=code,
+        CourseName="Course",
+        ActivityName="Lec",
+        StartTime="09:00:00",
+        EndTime="10:00:00",
+        Weeks=[
+            models.Week(WeekNumber=1, StartDate="2023-09-04"),
+            models.Week(WeekNumber=3, StartDate="2023-09-18"),
+        ],
+        Locations=[models.Location(Building="B", Room="1")],
+    )
+    base.update(overrides)
+    return models.Activity(**base)
+
+
+def render(out_path, activities):
+    events = ics_builder.build_events(activities, tz=parse_timezone("Europe/London"))
+    summary = incremental.write_incremental(
+        out_path, PROGRAMME_INFO, events, activities=activities, reproducible=True
+    )
+    full = io.BytesIO()
+    ics_builder.write_ics(
+        full, PROGRAMME_INFO, events, activities=activities, reproducible=True
+    )
+    assert out_path.read_bytes() == full.getvalue()
+    return summary, {e["summary"].split(" - ")[0]: e["uid"] for e in events}
+
+
+def test_only_changed_events_are_rerendered(tmp_path):
+    out_path = tmp_path / "calendar.ics"
+    first, uids = render(out_path, [make_activity("AAA"), make_activity("BBB")])
+    assert first.rendered == 2 and first.reused == 0
+    assert sorted(first.added) == sorted(uids.values())
+
+    moved = make_activity("BBB", InstructorAccounts=[{"DisplayName": "Dr New"}])
+    second, _ = render(out_path, [make_activity("AAA"), moved])
+    assert (second.reused, second.rendered) == (1, 1)
+    assert second.modified == [uids["BBB"]]
+    assert second.added == second.removed == []
+
+    third, _ = render(out_path, [make_activity("AAA")])
+    assert (third.reused, third.rendered) == (1, 0)
+    assert third.removed == [uids["BBB"]]
+    changes = json.loads(incremental.changes_path(out_path).read_text())
+    assert changes == {"added": [], "removed": [uids["BBB"]], "modified": []}
+
+
+def test_stale_index_falls_back_to_full_render(tmp_path):
+    out_path = tmp_path / "calendar.ics"
+    render(out_path, [make_activity("AAA")])
+    out_path.write_bytes(b"edited by hand")
+    summary, _ = render(out_path, [make_activity("AAA")])
+    assert (summary.reused, summary.rendered) == (0, 1)
+
+
+def test_event_hash_covers_every_serialized_line_but_dtstamp():
+    tz = parse_timezone("Europe/London")
+    (event,) = ics_builder.build_events([make_activity("ABC")], tz=tz)
+    lines = ics_builder.event_lines(event, dtstamp=None)
+    assert not any(line.startswith("DTSTAMP") for line in lines)
+    assert "RRULE:FREQ=WEEKLY;INTERVAL=2;WKST=MO;UNTIL=20230918T080000Z" in lines
+
+    (weekly,) = ics_builder.build_events(
+        [make_activity("ABC")], tz=tz, recurrence="weekly"
+    )
+    # Same occurrences, different RRULE/EXDATE lines: a different hash.
+    assert weekly.occurrences() == event.occurrences()
+    assert incremental.event_hash(weekly) != incremental.event_hash(event)
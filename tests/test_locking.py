@@ -0,0 +1,77 @@
+import shutil
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+from hw_timetable import auth, util
+
+WORKERS = 4
+
+
+def run_workers(tmp_path, script):
+    code = textwrap.dedent(script)
+    procs = [
+        subprocess.Popen([sys.executable, "-c", code, str(tmp_path), str(i)])
+        for i in range(WORKERS)
+    ]
+    assert all(p.wait(timeout=60) == 0 for p in procs)
+
+
+def test_file_lock_serialises_processes(tmp_path):
+    counter = tmp_path / "counter.txt"
+    counter.write_text("0")
+    run_workers(
+        tmp_path,
+        """
+        import sys
+        from pathlib import Path
+        from hw_timetable import util
+
+        counter = Path(sys.argv[1]) / "counter.txt"
+        for _ in range(50):
+            with util.file_lock(counter):
+                value = int(counter.read_text())
+                counter.write_text(str(value + 1))
+        """,
+    )
+    assert counter.read_text() == str(WORKERS * 50)
+
+
+def test_token_store_keeps_every_profile_under_concurrency(tmp_path):
+    run_workers(
+        tmp_path,
+        """
+        import sys
+        from pathlib import Path
+        from hw_timetable import auth
+
+        store = auth.TokenStore(Path(sys.argv[1]) / "tokens.json")
+        for n in range(10):
+            store.save(f"token-{sys.argv[2]}-{n}", profile=f"p{sys.argv[2]}")
+        """,
+    )
+    store = auth.TokenStore(tmp_path / "tokens.json")
+    assert store.profiles() == [f"p{i}" for i in range(WORKERS)]
+    assert store.load("p0").token == "token-0-9"
+
+
+def test_out_dir_redirects_every_output(offline_out, run_cli, tmp_path):
+    run_dir = tmp_path / "runs" / "a"
+    shutil.copytree(offline_out / "json", run_dir / "json")
+    run_cli("--offline", "--out-dir", str(run_dir))
+    assert len(list((run_dir / "ics").glob("*.ics"))) == 1
+    # Lock files stay out of the published calendar directory.
+    assert [p.suffix for p in (run_dir / "ics").iterdir()] == [".ics"]
+    assert len(list((run_dir / "locks").glob("*.lock"))) == 1
+    assert len(list((run_dir / "manifests").glob("*.json"))) == 1
+    assert not list((offline_out / "ics").iterdir())
+    assert not (offline_out / "manifests").exists()
+
+
+def test_atomic_writes_leave_no_temp_files(tmp_path):
+    target = tmp_path / "cal.ics"
+    for n in range(3):
+        util.write_if_changed(target, f"v{n}".encode())
+    assert Path(target).read_text() == "v2"
+    assert [p.name for p in tmp_path.iterdir()] == ["cal.ics"]
@@ -0,0 +1,158 @@
+import base64
+import json
+import os
+import stat
+from pathlib import Path
+
+import pytest
+
+from hw_timetable import cli, models, util
+
+PROGRAMME_INFO = {"AcademicYear": "2023/4", "CampusCode": "SCO", "Cohort": "1"}
+ACTIVITY = {
+    "CourseCode": "ABC",
+    "CourseName": "Course",
+    "ActivityName": "Lec",
+    "StartTime": "09:00:00",
+    "EndTime": "10:00:00",
+    "SemesterCode": "S1",
+    "Weeks": [{"WeekNumber": 1, "StartDate": "2023-09-04"}],
+}
+
+
+@pytest.fixture
+def offline_tree(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    json_dir = tmp_path / "out/json"
+    json_dir.mkdir(parents=True)
+    (json_dir / "Student_programme-info.json").write_text(json.dumps(PROGRAMME_INFO))
+    (json_dir / "activity_activities.json").write_text(json.dumps([ACTIVITY]))
+    return json_dir
+
+
+def test_unchanged_inputs_skip_the_pipeline(offline_tree, monkeypatch):
+    first = cli.export(cli.parse_args(["--offline", "--reproducible"]))
+    built = first.read_bytes()
+
+    def fail(*args, **kwargs):
+        raise AssertionError("activities should not be re-validated")
+
+    with monkeypatch.context() as m:
+        m.setattr(models, "parse_activities", fail)
+        assert cli.export(cli.parse_args(["--offline", "--reproducible"])) == first
+    assert first.read_bytes() == built
+
+    changed = dict(ACTIVITY, EndTime="11:00:00")
+    (offline_tree / "activity_activities.json").write_text(json.dumps([changed]))
+    cli.export(cli.parse_args(["--offline", "--reproducible"]))
+    assert first.read_bytes() != built
+    assert not list(first.parent.glob("*.tmp"))
+
+
+def test_atomic_write_leaves_identical_files_untouched(tmp_path):
+    target = tmp_path / "calendar.ics"
+    with util.atomic_write(target) as f:
+        f.write(b"BEGIN:VCALENDAR\r\n")
+    assert f.changed
+    inode = target.stat().st_ino
+    with util.atomic_write(target) as f:
+        f.write(b"BEGIN:VCALENDAR\r\n")
+    assert not f.changed
+    assert target.stat().st_ino == inode
+    assert util.write_if_changed(tmp_path / "new.json", b"[]")
+    assert not util.write_if_changed(tmp_path / "new.json", b"[]")
+    assert sorted(p.name for p in Path(tmp_path).iterdir()) == [
+        "calendar.ics",
+        "new.json",
+    ]
+
+
+@pytest.mark.skipif(os.name == "nt", reason="POSIX permissions")
+def test_atomic_write_uses_default_permissions(tmp_path, monkeypatch):
+    monkeypatch.setattr(util, "_UMASK", 0o022)
+    util.write_if_changed(tmp_path / "calendar.ics", b"v1")
+    util.write_if_changed(tmp_path / "token.json", b"{}", mode=0o600)
+    assert stat.S_IMODE((tmp_path / "calendar.ics").stat().st_mode) == 0o644
+    assert stat.S_IMODE((tmp_path / "token.json").stat().st_mode) == 0o600
+
+
+def test_semesters_read_for_bitstring_weeks_are_tracked(offline_tree, monkeypatch):
+    bits = dict(ACTIVITY, Weeks="1011")
+    (offline_tree / "activity_activities.json").write_text(json.dumps([bits]))
+    semesters = [{"Code": "S1", "StartDate": "2023-09-04", "EndDate": "2023-12-15"}]
+    (offline_tree / "systemadmin_semesters.json").write_text(json.dumps(semesters))
+    args = ["--offline", "--reproducible"]
+    first = cli.export(cli.parse_args(args))
+    text = first.read_text()
+    assert "DTSTART;TZID=Europe/London:20230904T090000" in text
+    assert "EXDATE;TZID=Europe/London:20230911T090000" in text
+
+    with monkeypatch.context() as m:
+        m.setattr(models, "parse_activities", pytest.fail)
+        assert cli.export(cli.parse_args(args)) == first
+
+    # The semester table is an input now: moving week 1 rebuilds the calendar.
+    semesters[0]["StartDate"] = "2023-09-11"
+    (offline_tree / "systemadmin_semesters.json").write_text(json.dumps(semesters))
+    cli.export(cli.parse_args(args))
+    assert "DTSTART;TZID=Europe/London:20230911T090000" in first.read_text()
+
+
+def test_caldav_runs_are_not_skipped_until_a_sync_succeeds(offline_tree, monkeypatch):
+    from hw_timetable import caldav
+
+    outcomes = []
+
+    class Sink:
+        def __init__(self, url, **kwargs):
+            pass
+
+        def sync(self, events):
+            ok = outcomes.pop(0)
+            return caldav.SyncResult(failed={} if ok else {"uid": "412"})
+
+    monkeypatch.setattr(caldav, "CalDAVSink", Sink)
+    cli.export(cli.parse_args(["--offline"]))
+    args = cli.parse_args(["--offline", "--caldav-url", "http://dav.example/cal/"])
+    # Pushing to a new target is not covered by the plain run's manifest, and
+    # a partly failed push is retried on the next run.
+    outcomes[:] = [False, True]
+    cli.export(args)
+    cli.export(args)
+    assert not outcomes
+    cli.export(args)  # would pop from the empty list if it synced again
+
+
+def test_skipped_incremental_run_clears_the_change_list(offline_tree):
+    from hw_timetable import incremental
+
+    args = cli.parse_args(["--offline", "--incremental"])
+    out = cli.export(args)
+    changes = incremental.changes_path(out)
+    assert json.loads(changes.read_text())["added"]
+    assert cli.export(args) == out
+    assert json.loads(changes.read_text()) == {
+        "added": [],
+        "removed": [],
+        "modified": [],
+    }
+
+
+def test_manifests_follow_the_user_not_the_token():
+    from hw_timetable import manifest
+
+    def jwt(**claims):
+        body = base64.urlsafe_b64encode(json.dumps(claims).encode()).decode()
+        return f"e30.{body.rstrip('=')}.sig"
+
+    options = {"tz": "Europe/London"}
+    rotated = [jwt(sub="alice", exp=n) for n in (1, 2)]
+    paths = {
+        manifest.manifest_path(options, manifest.user_identity(t, "default"))
+        for t in rotated
+    }
+    assert len(paths) == 1
+    bob = manifest.user_identity(jwt(sub="bob"), "default")
+    assert manifest.manifest_path(options, bob) not in paths
+    assert manifest.user_identity("opaque", "work") == "profile:work"
+    assert manifest.user_identity(None, "default") is None
@@ -0,0 +1,71 @@
+"""Peak-memory budgets for building calendars from large timetables.
+
+Each run decodes, validates, builds and serializes a synthetic timetable
+under tracemalloc. A change that makes memory per activity grow, or makes it
+scale worse than linearly, fails here before it reaches a large cohort.
+"""
+
+import json
+import tracemalloc
+
+from hw_timetable import ics_builder, models, synthetic
+from hw_timetable.util import parse_timezone
+
+# Measured at ~10 KiB per activity (12-week semester, 10 teaching weeks each,
+# serialized output included); the budget leaves headroom for noise.
+PEAK_BYTES_PER_ACTIVITY = 16 * 1024
+SIZES = (250, 500, 1000, 2000)
+TZ = parse_timezone("Europe/London")
+
+
+class CountingSink:
+    """Binary stream that keeps only a byte count, so output is not retained."""
+
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+        return len(data)
+
+
+def export(bodies):
+    activities = models.parse_activities(bodies["/activity/activities"])
+    blocked = [
+        models.BlockedPeriod.model_validate(b)
+        for b in json.loads(bodies["/activity/blocked-out-periods"])
+    ]
+    events = ics_builder.collect_events(
+        activities, blocked, tz=TZ, include_blocked=True
+    )
+    sink = CountingSink()
+    ics_builder.write_ics(sink, {}, events, activities=activities)
+    return sink.size
+
+
+def peak_memory(count):
+    bodies = synthetic.payloads(count, blocked=count // 10, seed=count)
+    tracemalloc.start()
+    try:
+        written = export(bodies)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert written > 0
+    return peak
+
+
+def test_peak_memory_budget_and_linear_scaling():
+    export(synthetic.payloads(5))  # build validators and caches untraced
+    peaks = {count: peak_memory(count) for count in SIZES}
+    per_activity = {count: peak / count for count, peak in peaks.items()}
+
+    for count, used in per_activity.items():
+        assert used < PEAK_BYTES_PER_ACTIVITY, (
+            f"{count} activities peaked at {used / 1024:.1f} KiB per activity "
+            f"(budget {PEAK_BYTES_PER_ACTIVITY / 1024:.0f} KiB)"
+        )
+    # Doubling the input must not much more than double the peak.
+    for small, large in zip(SIZES, SIZES[1:]):
+        assert peaks[large] / peaks[small] < 2.3, per_activity
+    assert per_activity[SIZES[-1]] < 1.25 * per_activity[SIZES[0]], per_activity
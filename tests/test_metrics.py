@@ -0,0 +1,68 @@
+import json
+
+from hw_timetable import ics_builder, metrics, models, synthetic
+from hw_timetable.util import parse_timezone
+
+
+def test_null_metrics_record_nothing():
+    with metrics.NULL.stage("anything"):
+        metrics.NULL.count("things", 5)
+    assert not metrics.NULL.enabled
+    assert not hasattr(metrics.NULL, "counters")
+
+
+def test_build_ics_counts_its_work():
+    activities = [
+        models.Activity.model_validate(row)
+        for row in synthetic.activities(100, weeks_per_activity=6, seed=2)
+    ]
+    stats = metrics.Metrics()
+    text, events = ics_builder.build_ics(
+        {},
+        activities,
+        [],
+        tz=parse_timezone("Europe/London"),
+        metrics=stats,
+    )
+    assert set(stats.stages) == {"build", "serialize"}
+    counters = stats.counters
+    assert counters["groups"] == len(events)
+    assert counters["occurrences"] == sum(len(a.Weeks) for a in activities)
+    assert counters["exdates"] == sum(len(e["exdates"]) for e in events)
+    assert counters["output_bytes"] == len(text.encode("utf-8"))
+
+
+def test_cli_writes_metrics_json(offline_out, run_cli, tmp_path):
+    target = tmp_path / "metrics.json"
+    result = run_cli(
+        "--offline",
+        "--timings",
+        "--metrics-json",
+        str(target),
+        capture_output=True,
+        text=True,
+    )
+    assert "Timings:" in result.stderr
+    data = json.loads(target.read_text(encoding="utf-8"))
+    assert {"fetch", "validate", "build", "write", "total"} <= set(data["stages_s"])
+    assert data["counters"]["activities_validated"] == 1
+    assert data["counters"]["output_bytes"] > 0
+
+
+def test_validated_count_is_taken_before_the_semester_filter(
+    offline_out, tmp_path, monkeypatch
+):
+    from datetime import date
+
+    from hw_timetable import cli, util
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(util, "today", lambda: date(2023, 10, 2))
+    path = offline_out / "json/activity_activities.json"
+    rows = json.loads(path.read_text())
+    path.write_text(json.dumps([*rows, dict(rows[0], SemesterCode="S2")]))
+
+    stats = metrics.Metrics()
+    cli.export(cli.parse_args(["--offline", "--only-current-semester"]), stats=stats)
+    assert stats.counters["activities_validated"] == 2
+    assert stats.counters["activities_selected"] == 1
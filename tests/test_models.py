@@ -0,0 +1,55 @@
+import json
+
+import pytest
+from pydantic import ValidationError
+
+from hw_timetable import ics_builder, models
+from hw_timetable.util import parse_timezone
+
+PAYLOAD = json.dumps(
+    [
+        {
+            "CourseCode": "ABC",
+            "CourseName": "Course",
+            "ActivityName": "Lec",
+            "ActivityTypeDescription": "Lecture",
+            "StartTime": "09:00:00",
+            "EndTime": "10:00:00",
+            "Weeks": [
+                {"WeekNumber": 1, "StartDate": "2023-09-04"},
+                {"WeekNumber": 3, "StartDate": "2023-09-18"},
+            ],
+            "RunningWeeks": "111",
+            "ScheduledDay": 1,
+            "Locations": [{"Building": "B", "Room": "1"}],
+            "InstructorAccounts": [{"DisplayName": " Dr Who "}],
+            "Unrelated": "ignored",
+        },
+        {
+            "CourseCode": "XYZ",
+            "CourseName": "Other",
+            "ActivityName": "Lab",
+            "StartTime": "11:00:00",
+            "EndTime": "12:00:00",
+            "Weeks": None,
+            "RunningWeeks": [{"StartDate": "2023-09-04"}],
+        },
+    ]
+).encode()
+
+
+def test_trusted_records_build_the_same_events_as_validated_models():
+    tz = parse_timezone("Europe/London")
+    strict = models.parse_activities(PAYLOAD)
+    trusted = models.parse_activities(PAYLOAD, trusted=True)
+    assert all(isinstance(a, models.Activity) for a in strict)
+    assert all(isinstance(a, models.ActivityRecord) for a in trusted)
+    assert trusted[0].RunningWeeks == []
+    assert ics_builder.build_events(trusted, tz=tz) == ics_builder.build_events(
+        strict, tz=tz
+    )
+
+
+def test_strict_parsing_rejects_invalid_rows():
+    with pytest.raises(ValidationError):
+        models.parse_activities(b'[{"CourseName": "missing code"}]')
@@ -1,80 +1,39 @@
-import json
-import shutil
-import subprocess
-import sys
 from pathlib import Path
 
 from hw_timetable import ics_builder
 
 
-def test_offline_cli_execution():
-    base = Path("out")
-    if base.exists():
-        shutil.rmtree(base)
-    json_dir = base / "json"
-    json_dir.mkdir(parents=True)
-    (base / "ics").mkdir(parents=True)
-
-    with (json_dir / "Student_programme-info.json").open("w", encoding="utf-8") as f:
-        json.dump(
+def test_offline_cli_execution(offline_out, run_cli):
+    run_cli("--offline")
+    expected = (
+        offline_out
+        / "ics"
+        / ics_builder.output_filename(
             {
                 "AcademicYear": "2023/4",
                 "CampusCode": "SCO",
                 "Cohort": "1",
                 "Semesters": ["S1"],
-            },
-            f,
-        )
-    with (json_dir / "systemadmin_semesters.json").open("w", encoding="utf-8") as f:
-        json.dump(
-            [
-                {
-                    "Code": "S1",
-                    "StartDate": "2023-09-04",
-                    "EndDate": "2023-12-15",
-                }
-            ],
-            f,
+            }
         )
-    with (json_dir / "activity_activities.json").open("w", encoding="utf-8") as f:
-        json.dump(
-            [
-                {
-                    "CourseCode": "ABC",
-                    "CourseName": "Course",
-                    "ActivityName": "Lec",
-                    "ActivityTypeDescription": "Lecture",
-                    "Type": "Lecture",
-                    "Group": None,
-                    "Cohort": None,
-                    "ProgrammeCodes": ["PC"],
-                    "SemesterCode": "S1",
-                    "StartTime": "09:00:00",
-                    "EndTime": "10:00:00",
-                    "Weeks": [{"WeekNumber": 1, "StartDate": "2023-09-04"}],
-                    "RunningWeeks": [],
-                    "ScheduledDay": 0,
-                    "Locations": [{"Building": "B", "Room": "1"}],
-                    "InstructorAccounts": [],
-                    "ActivityWeekLabel": "Week",
-                }
-            ],
-            f,
-        )
-    for name in [
-        "activity_blocked-out-periods.json",
-        "activity_ad-hoc.json",
-    ]:
-        with (json_dir / name).open("w", encoding="utf-8") as f:
-            json.dump([], f)
-
-    subprocess.run([sys.executable, "-m", "hw_timetable.cli", "--offline"], check=True)
-    expected = Path("out/ics") / ics_builder.output_filename(
-        {
-            "AcademicYear": "2023/4",
-            "CampusCode": "SCO",
-            "Cohort": "1",
-            "Semesters": ["S1"],
-        }
     )
     assert expected.exists()
+
+
+def test_offline_cli_streams_calendar_to_stdout(offline_out, run_cli):
+    result = run_cli("--offline", "-o", "-", capture_output=True)
+    assert result.stdout.startswith(b"BEGIN:VCALENDAR\r\n")
+    assert result.stdout.endswith(b"END:VCALENDAR\r\n")
+    assert result.stdout.count(b"BEGIN:VEVENT") == 1
+    assert not list((offline_out / "ics").iterdir())
+
+
+def test_offline_cli_reproducible_run_writes_etag(offline_out, run_cli):
+    output = offline_out / "ics/repro.ics"
+    outputs = []
+    for _ in range(2):
+        run_cli("--offline", "--reproducible", "-o", str(output))
+        etag = Path(f"{output}.etag").read_text(encoding="utf-8").strip()
+        assert etag == ics_builder.content_etag(output.read_bytes())
+        outputs.append(output.read_bytes())
+    assert outputs[0] == outputs[1]
@@ -0,0 +1,46 @@
+import pstats
+
+from hw_timetable import ics_builder, models, synthetic
+from hw_timetable.profiling import ProfilingMetrics
+from hw_timetable.util import parse_timezone
+
+
+def test_stages_are_profiled_for_cpu_and_memory(tmp_path):
+    activities = [
+        models.Activity.model_validate(row) for row in synthetic.activities(200)
+    ]
+    stats = ProfilingMetrics(cpu_profile=tmp_path / "run.pstats", memory=True, top=5)
+    with stats.stage("build"):
+        events = ics_builder.build_events(
+            activities, tz=parse_timezone("Europe/London")
+        )
+    with stats.stage("unprofiled"):
+        pass
+    summary = stats.finish()
+
+    assert events
+    assert [s.name for s in stats.memory_stages] == ["build"]
+    assert stats.memory_stages[0].peak >= stats.memory_stages[0].net > 0
+    assert "Memory by stage:" in summary
+    profile = pstats.Stats(str(tmp_path / "run.pstats"))
+    functions = {name for _, _, name in profile.stats}
+    assert "build_events" in functions
+    assert set(stats.as_dict()["memory"]) == {"build"}
+
+
+def test_cli_profile_flags(offline_out, run_cli, tmp_path):
+    target = tmp_path / "cli.pstats"
+    result = run_cli(
+        "--offline",
+        "--profile",
+        str(target),
+        "--timings",
+        "--profile-top",
+        "3",
+        capture_output=True,
+        text=True,
+    )
+    assert target.exists()
+    assert f"CPU profile saved to {target}" in result.stderr
+    assert "Timings:" in result.stderr
+    assert pstats.Stats(str(target)).total_calls > 0
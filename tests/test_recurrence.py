@@ -0,0 +1,166 @@
+import io
+import json
+import random
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from hw_timetable import ics_builder, metrics, models, recurrence, synthetic, weeks
+from hw_timetable.util import parse_timezone
+
+TZ = parse_timezone("Europe/London")
+
+
+def expand(segments):
+    mask = 0
+    for segment in segments:
+        assert segment.weeks & 1
+        assert mask & segment.weeks << segment.offset == 0  # disjoint
+        mask |= segment.weeks << segment.offset
+    return mask
+
+
+@pytest.mark.parametrize("mode", recurrence.MODES)
+def test_encoding_covers_exactly_the_input_weeks(mode):
+    rng = random.Random(mode)
+    for _ in range(2000):
+        length = rng.randrange(1, 53)
+        mask = rng.getrandbits(length) | 1 << (length - 1)
+        mask >>= (mask & -mask).bit_length() - 1
+        segments = recurrence.encode(mask, overhead=rng.choice([0, 40, 400]), mode=mode)
+        assert expand(segments) == mask
+        for segment in segments:
+            if segment.interval:
+                lattice = weeks.stride(segment.interval, segment.weeks.bit_length())
+                assert segment.weeks & ~lattice == 0
+            else:
+                assert mode == "compact" or segment.weeks == 1
+
+
+def test_cost_model_picks_intervals_splits_and_rdates():
+    fortnightly = 0b1010101010101
+    assert recurrence.encode(fortnightly, overhead=400) == [
+        recurrence.Segment(0, fortnightly, 2)
+    ]
+    two_blocks = 0b11111 | 0b11111 << 30
+    # 25 EXDATEs take ~440 bytes; a second VEVENT is cheaper below that.
+    assert recurrence.encode(two_blocks, overhead=450)[0].weeks == two_blocks
+    assert recurrence.encode(two_blocks, overhead=300) == [
+        recurrence.Segment(0, 0b11111, 1),
+        recurrence.Segment(30, 0b11111, 1),
+    ]
+    assert recurrence.encode(two_blocks, overhead=400, mode="weekly") == [
+        recurrence.Segment(0, two_blocks, 1)
+    ]
+    scattered = 0b100000001000001
+    assert recurrence.encode(scattered, overhead=400, mode="compact") == [
+        recurrence.Segment(0, scattered, 0)
+    ]
+    # Without RDATE the even weeks 0, 6 and 14 fit a fortnightly rule.
+    assert recurrence.encode(scattered, overhead=400) == [
+        recurrence.Segment(0, scattered, 2)
+    ]
+
+
+def unfold(text):
+    return text.replace("\r\n ", "").split("\r\n")
+
+
+def local(value):
+    return datetime.strptime(value, "%Y%m%dT%H%M%S")
+
+
+def expand_calendar(text):
+    """Expand every VEVENT with a minimal RFC 5545 weekly-rule reader."""
+
+    by_event = defaultdict(set)
+    props = {}
+    for line in unfold(text):
+        if line == "BEGIN:VEVENT":
+            props = {}
+        elif line == "END:VEVENT":
+            start = local(props["DTSTART"])
+            starts = {start}
+            if "RRULE" in props:
+                rule = dict(part.split("=") for part in props["RRULE"].split(";"))
+                assert rule["FREQ"] == "WEEKLY"
+                step = timedelta(weeks=int(rule.get("INTERVAL", 1)))
+                until = datetime.strptime(rule["UNTIL"], "%Y%m%dT%H%M%SZ")
+                until = until.replace(tzinfo=timezone.utc)
+                day = start
+                while day.replace(tzinfo=TZ) <= until:
+                    starts.add(day)
+                    day += step
+            for name, sign in (("RDATE", 1), ("EXDATE", -1)):
+                listed = {local(v) for v in props.get(name, "").split(",") if v}
+                assert sign < 0 or not listed & starts
+                assert sign > 0 or listed <= starts
+                starts = starts | listed if sign > 0 else starts - listed
+            key = (props["SUMMARY"], props.get("LOCATION"), props["DESCRIPTION"])
+            assert not by_event[key] & starts
+            by_event[key] |= starts
+        elif ":" in line:
+            name, value = line.split(":", 1)
+            props[name.split(";")[0]] = value
+    return dict(by_event)
+
+
+def render(activities, mode):
+    buffer = io.BytesIO()
+    events = ics_builder.build_events(activities, tz=TZ, recurrence=mode)
+    ics_builder.write_ics(buffer, {}, events, reproducible=True)
+    return events, buffer.getvalue().decode("utf-8")
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_rendered_recurrences_expand_to_the_timetable(seed):
+    rows = synthetic.activities(
+        400, weeks=30, weeks_per_activity=8, courses=400, seed=seed
+    )
+    activities = models.parse_activities(json.dumps(rows).encode())
+    expected = defaultdict(set)
+    for row in rows:
+        for week in row["Weeks"]:
+            day = date.fromisoformat(week["StartDate"])
+            day += timedelta(days=row["ScheduledDay"])
+            expected[row["ActivityName"]].add(
+                datetime.combine(
+                    day, datetime.strptime(row["StartTime"], "%H:%M:%S").time()
+                )
+            )
+
+    sizes = {}
+    for mode in ("weekly", "rrule", "compact"):
+        events, text = render(activities, mode)
+        sizes[mode] = len(text)
+        expanded = {
+            key[2].rsplit("Activity code: ", 1)[1]: starts
+            for key, starts in expand_calendar(text).items()
+        }
+        assert expanded == expected, mode
+        assert len({e.uid for e in events}) == len(events)
+    assert sizes["compact"] <= sizes["rrule"] < sizes["weekly"]
+
+
+def test_split_events_keep_distinct_uids_and_metrics_count_them():
+    activity = models.Activity(
+        CourseCode="ABC",
+        CourseName="C",
+        ActivityName="Lec",
+        StartTime="09:00:00",
+        EndTime="10:00:00",
+        Weeks=[
+            models.Week(StartDate=(date(2023, 9, 4) + timedelta(weeks=w)).isoformat())
+            for w in [*range(5), *range(30, 35)]
+        ],
+    )
+    events, text = render([activity], "rrule")
+    assert [e.start.date() for e in events] == [date(2023, 9, 4), date(2024, 4, 1)]
+    assert events[0].uid != events[1].uid
+    assert "EXDATE" not in text
+    stats = metrics.Metrics()
+    ics_builder.build_events([activity], tz=TZ, metrics=stats)
+    assert stats.counters["groups"] == 1 and stats.counters["vevents"] == 2
+    (legacy,) = ics_builder.build_events([activity], tz=TZ, recurrence="weekly")
+    assert len(legacy.exdates) == 25
@@ -0,0 +1,100 @@
+import random
+import threading
+import time
+
+import pytest
+
+from hw_timetable import api
+from hw_timetable.retry import RetryPolicy, parse_retry_after
+
+
+class FakeResponse:
+    def __init__(self, status_code, content=b"[]", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"{self.status_code} error")
+
+
+class ScriptedSession:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.calls.append((time.monotonic(), timeout))
+        return self.responses.pop(0)
+
+
+def make_client(tmp_path, monkeypatch, session, policy):
+    monkeypatch.chdir(tmp_path)
+    client = api.APIClient("tok", use_cache=False, retry=policy)
+    client.session = session
+    return client
+
+
+def test_parse_retry_after_forms():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:10 GMT", now=1445412480) == 10
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_full_jitter_stays_within_the_exponential_cap():
+    policy = RetryPolicy(base_delay=1, max_delay=4, rng=random.Random(7))
+    for attempt in range(6):
+        delays = [policy.backoff(attempt) for _ in range(200)]
+        cap = min(4, 2**attempt)
+        assert all(0 <= d <= cap for d in delays)
+        assert max(delays) > cap / 2  # spread out, not a fixed step
+    assert policy.backoff(0, retry_after="2") == 2
+
+
+def test_429_honours_retry_after(tmp_path, monkeypatch):
+    session = ScriptedSession(
+        FakeResponse(429, headers={"Retry-After": "0"}),
+        FakeResponse(503),
+        FakeResponse(200, b'{"ok": true}'),
+    )
+    policy = RetryPolicy(base_delay=0.01, rng=random.Random(1))
+    client = make_client(tmp_path, monkeypatch, session, policy)
+    assert client.get("/activity/activities") == {"ok": True}
+    assert len(session.calls) == 3
+
+
+def test_client_errors_are_not_retried(tmp_path, monkeypatch):
+    session = ScriptedSession(FakeResponse(404), FakeResponse(200))
+    client = make_client(tmp_path, monkeypatch, session, RetryPolicy())
+    with pytest.raises(RuntimeError, match="404"):
+        client.get("/activity/activities")
+    assert len(session.calls) == 1
+
+
+def test_request_budget_bounds_the_retries(tmp_path, monkeypatch):
+    session = ScriptedSession(
+        FakeResponse(503, headers={"Retry-After": "30"}), FakeResponse(200)
+    )
+    policy = RetryPolicy(request_budget=1.0)
+    client = make_client(tmp_path, monkeypatch, session, policy)
+    began = time.monotonic()
+    with pytest.raises(RuntimeError, match="out of time"):
+        client.get("/activity/activities")
+    assert time.monotonic() - began < 0.5
+    assert len(session.calls) == 1
+    assert session.calls[0][1] <= 1.0
+
+
+def test_cancel_wakes_sleeping_retries(tmp_path, monkeypatch):
+    session = ScriptedSession(
+        FakeResponse(503, headers={"Retry-After": "20"}), FakeResponse(200)
+    )
+    policy = RetryPolicy(request_budget=None)
+    client = make_client(tmp_path, monkeypatch, session, policy)
+    threading.Timer(0.1, policy.cancel).start()
+    began = time.monotonic()
+    with pytest.raises(RuntimeError, match="cancelled"):
+        client.get("/activity/activities")
+    assert time.monotonic() - began < 5
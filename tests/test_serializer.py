@@ -0,0 +1,81 @@
+import random
+
+from hw_timetable import ics_builder
+
+
+def reference_escape_text(value):
+    normalized = value.replace("\r\n", "\n").replace("\r", "\n")
+    escaped = normalized.replace("\\", "\\\\")
+    escaped = escaped.replace("\n", "\\n")
+    escaped = escaped.replace(",", "\\,")
+    escaped = escaped.replace(";", "\\;")
+    return escaped
+
+
+def reference_fold_line(line, limit=75):
+    if len(line.encode("utf-8")) <= limit:
+        return [line]
+    folded = []
+    current_chars = []
+    current_bytes = 0
+    for ch in line:
+        ch_bytes = len(ch.encode("utf-8"))
+        if current_bytes + ch_bytes > limit:
+            if current_chars:
+                folded.append("".join(current_chars))
+            current_chars = [" "]
+            current_bytes = 1
+        current_chars.append(ch)
+        current_bytes += ch_bytes
+    if current_chars:
+        folded.append("".join(current_chars))
+    return folded
+
+
+def reference_format_lines(lines):
+    formatted = []
+    for line in lines:
+        if not line:
+            continue
+        formatted.extend(reference_fold_line(line))
+    return "\r\n".join(formatted) + "\r\n"
+
+
+ALPHABETS = [
+    "abcXYZ019 -:",
+    "\\,;\r\n",
+    "\u00e9\u00fc\u00df",
+    "\u20ac\u4e2d\u6587",
+    "\U0001f600\U0001f4c5",
+]
+
+
+def fuzz_corpus(count=2000, seed=1234):
+    rng = random.Random(seed)
+    corpus = ["", "A" * 74, "A" * 75, "A" * 76, "\u00e9" * 38, "\U0001f600" * 19]
+    for _ in range(count):
+        alphabet = "".join(rng.sample(ALPHABETS, rng.randint(1, len(ALPHABETS))))
+        length = rng.choice([rng.randint(0, 10), rng.randint(60, 160), 400])
+        corpus.append("".join(rng.choice(alphabet) for _ in range(length)))
+    return corpus
+
+
+def test_escape_text_matches_reference():
+    for value in fuzz_corpus():
+        assert ics_builder._escape_text(value) == reference_escape_text(value)
+
+
+def test_folding_matches_reference_byte_for_byte():
+    corpus = [
+        "DESCRIPTION:" + ics_builder._escape_text(value) for value in fuzz_corpus()
+    ]
+    expected = reference_format_lines(corpus)
+    assert ics_builder._format_lines(corpus) == expected
+    streamed = b"".join(ics_builder.iter_ics_chunks(corpus))
+    assert streamed == expected.encode("utf-8")
+
+
+def test_folded_lines_respect_octet_limit():
+    for value in fuzz_corpus(count=300):
+        for part in ics_builder._fold_line("SUMMARY:" + value):
+            assert len(part.encode("utf-8")) <= 75
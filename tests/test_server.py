@@ -0,0 +1,127 @@
+import gzip
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from hw_timetable import cli, server
+
+ACTIVITY = {
+    "CourseCode": "ABC",
+    "CourseName": "Course",
+    "ActivityName": "Lec",
+    "ActivityTypeDescription": "Lecture",
+    "Type": "Lecture",
+    "Group": None,
+    "Cohort": None,
+    "ProgrammeCodes": ["PC"],
+    "SemesterCode": "S1",
+    "StartTime": "09:00:00",
+    "EndTime": "10:00:00",
+    "Weeks": [{"WeekNumber": 1, "StartDate": "2023-09-04"}],
+    "RunningWeeks": [],
+    "ScheduledDay": 0,
+    "Locations": [{"Building": "B", "Room": "1"}],
+    "InstructorAccounts": [],
+    "ActivityWeekLabel": "Week",
+}
+
+
+class DictClient:
+    def __init__(self, payloads):
+        self.payloads = payloads
+        self.fetches = 0
+
+    def get_bytes(self, endpoint):
+        self.fetches += 1
+        return json.dumps(self.payloads[endpoint]).encode()
+
+    def get_many(self, endpoints, raw=False):
+        return {e: self.get_bytes(e) for e in endpoints}
+
+
+@pytest.fixture
+def feed():
+    client = DictClient(
+        {
+            "/Student/programme-info": {"AcademicYear": "2023/4"},
+            "/activity/activities": [ACTIVITY],
+            "/activity/blocked-out-periods": [],
+        }
+    )
+    store = server.FeedStore(client, cli.parse_args([]))
+    store.refresh()
+    httpd = server.make_server(store, "127.0.0.1", 0)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    host, port = httpd.server_address[:2]
+    yield store, client, f"http://{host}:{port}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def fetch(url, headers=None):
+    request = urllib.request.Request(url, headers=headers or {})
+    try:
+        with urllib.request.urlopen(request) as resp:
+            return resp.status, resp.headers, resp.read()
+    except urllib.error.HTTPError as err:
+        return err.code, err.headers, err.read()
+
+
+def test_feed_revalidates_with_etag(feed):
+    _, _, base = feed
+    status, headers, body = fetch(base + "/calendar.ics")
+    assert status == 200
+    assert body.startswith(b"BEGIN:VCALENDAR")
+    assert b"BEGIN:VEVENT" in body
+    etag = headers["ETag"]
+
+    status, headers, body = fetch(base + "/calendar.ics", {"If-None-Match": etag})
+    assert status == 304
+    assert body == b""
+
+
+def test_feed_gzip_and_filters(feed):
+    _, _, base = feed
+    status, headers, body = fetch(base + "/calendar.ics", {"Accept-Encoding": "gzip"})
+    assert status == 200
+    assert headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(body).startswith(b"BEGIN:VCALENDAR")
+
+    plain_etag = fetch(base + "/calendar.ics")[1]["ETag"]
+    status, headers, body = fetch(
+        base + "/calendar.ics", {"Accept-Encoding": "gzip;q=0"}
+    )
+    assert "Content-Encoding" not in headers
+    assert headers["ETag"] == plain_etag
+    assert body.startswith(b"BEGIN:VCALENDAR")
+
+    _, _, filtered = fetch(base + "/calendar.ics?course=XYZ")
+    assert b"BEGIN:VEVENT" not in filtered
+    assert fetch(base + "/calendar.ics?start=nonsense")[0] == 400
+    assert fetch(base + "/nowhere")[0] == 404
+
+
+def test_refresh_keeps_renders_until_data_changes(feed):
+    store, client, base = feed
+    first = fetch(base + "/calendar.ics")[1]["ETag"]
+    assert store.refresh() is False
+    assert fetch(base + "/calendar.ics")[1]["ETag"] == first
+
+    moved = dict(ACTIVITY, StartTime="11:00:00", EndTime="12:00:00")
+    client.payloads["/activity/activities"] = [moved]
+    assert store.refresh() is True
+    assert fetch(base + "/calendar.ics")[1]["ETag"] != first
+
+
+def test_accept_encoding_q_values():
+    assert server.accepts_gzip("gzip, deflate")
+    assert server.accepts_gzip("deflate;q=0.5, GZIP;q=0.1")
+    assert server.accepts_gzip("*")
+    assert not server.accepts_gzip("gzip;q=0")
+    assert not server.accepts_gzip("identity, x-gzip;q=0")
+    assert not server.accepts_gzip("gzip;q=0.0, *")
+    assert not server.accepts_gzip("")
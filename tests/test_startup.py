@@ -0,0 +1,33 @@
+import subprocess
+import sys
+
+# Cumulative import time allowed for everything the CLI pulls in on --help.
+IMPORT_BUDGET_US = 100_000
+HEAVY_MODULES = {"pydantic", "requests", "dotenv", "hw_timetable.ics_builder"}
+
+
+def test_cli_help_import_time_budget():
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "hw_timetable.cli", "--help"],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    cumulative = 0
+    imported = set()
+    started = False
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative_us, name = line[len("import time:") :].split("|")
+        if not cumulative_us.strip().isdigit():
+            continue  # header row
+        started = started or name.strip() == "hw_timetable"
+        if not started:
+            continue  # interpreter start-up (site, encodings, ...)
+        imported.add(name.strip())
+        if not name[1:].startswith(" "):
+            cumulative += int(cumulative_us)
+    assert started
+    assert not imported & HEAVY_MODULES
+    assert cumulative < IMPORT_BUDGET_US, f"--help imports took {cumulative} us"
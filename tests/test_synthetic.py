@@ -0,0 +1,33 @@
+import json
+
+from hw_timetable import ics_builder, models, synthetic
+from hw_timetable.util import parse_timezone
+
+
+def test_generator_is_deterministic():
+    assert synthetic.payloads(50, seed=3) == synthetic.payloads(50, seed=3)
+    assert synthetic.activities(50, seed=3) != synthetic.activities(50, seed=4)
+
+
+def test_generated_payloads_match_the_schemas():
+    bodies = synthetic.payloads(
+        200, blocked=10, weeks_per_activity=6, locations=2, instructors=3
+    )
+    activities = models.parse_activities(bodies["/activity/activities"])
+    assert len(activities) == 200
+    assert all(1 <= len(a.Weeks) <= 6 for a in activities)
+    assert all(len(a.Locations) == 2 for a in activities)
+    assert all(len(a.InstructorAccounts) == 3 for a in activities)
+    blocked = [
+        models.BlockedPeriod.model_validate(b)
+        for b in json.loads(bodies["/activity/blocked-out-periods"])
+    ]
+    assert len(blocked) == 10
+
+
+def test_generated_timetable_builds():
+    rows = synthetic.activities(300, seed=1)
+    activities = [models.Activity.model_validate(row) for row in rows]
+    events = ics_builder.build_events(activities, tz=parse_timezone("Europe/London"))
+    assert len(events) == len({a.ActivityName for a in activities})
+    assert any(e["exdates"] for e in events)  # sparse week patterns are present
@@ -1,3 +1,5 @@
+import io
+
 from hw_timetable import ics_builder, models
 from hw_timetable.util import parse_timezone
 
@@ -167,3 +169,42 @@ def test_output_filename_handles_current_academic_year_key():
     }
     name = ics_builder.output_filename(programme_info)
     assert name == "hw_timetable_2026-7_ED_FT_S1.ics"
+
+
+def test_write_ics_streams_same_bytes_as_build_ics():
+    activity = _build_single_activity(CourseName="Cours\u00e9 " * 12)
+    tz = parse_timezone("Europe/London")
+    programme_info = {"AcademicYear": "2023/4", "Semesters": ["S1"]}
+    ics, events = ics_builder.build_ics(programme_info, [activity], [], tz=tz)
+    stream = io.BytesIO()
+    written = ics_builder.write_ics(
+        stream, programme_info, events, activities=[activity]
+    )
+    assert written == len(stream.getvalue())
+
+    def without_dtstamp(text):
+        return [line for line in text.split("\r\n") if not line.startswith("DTSTAMP")]
+
+    assert without_dtstamp(stream.getvalue().decode("utf-8")) == without_dtstamp(ics)
+
+
+def test_reproducible_output_is_byte_identical_and_order_independent():
+    first = _build_single_activity(CourseCode="AAA")
+    second = _build_single_activity(
+        CourseCode="BBB",
+        Weeks=[models.Week(WeekNumber=1, StartDate="2023-09-04")],
+        ScheduledDay=2,
+    )
+    tz = parse_timezone("Europe/London")
+    programme_info = {"AcademicYear": "2023/4", "Semesters": ["S1"]}
+    ics_a, _ = ics_builder.build_ics(
+        programme_info, [first, second], [], tz=tz, reproducible=True
+    )
+    ics_b, _ = ics_builder.build_ics(
+        programme_info, [second, first], [], tz=tz, reproducible=True
+    )
+    assert ics_a == ics_b
+    assert "DTSTAMP:20230904T080000Z" in ics_a
+    assert ics_builder.content_etag(ics_a.encode()) == ics_builder.content_etag(
+        ics_b.encode()
+    )
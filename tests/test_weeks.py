@@ -1,4 +1,10 @@
-from hw_timetable import ics_builder, models
+import json
+from datetime import date
+
+import pytest
+from pydantic import ValidationError
+
+from hw_timetable import ics_builder, models, weeks
 from hw_timetable.util import parse_timezone
 
 
@@ -38,4 +44,133 @@ def test_weeks_preferred_over_runningweeks():
     }
     ics, _ = ics_builder.build_ics(programme_info, [activity], [], tz=tz)
     assert "DTSTART;TZID=Europe/London:20231002T090000" in ics
-    assert "EXDATE;TZID=Europe/London:20231009T090000" in ics
+    # Weeks 5 and 7 only: fortnightly, so week 6 needs no EXDATE.
+    assert "RRULE:FREQ=WEEKLY;INTERVAL=2;WKST=MO;UNTIL=20231016T080000Z" in ics
+    assert "EXDATE" not in ics
+
+
+def test_date_window_applies_to_unsorted_weeks():
+    activity = models.Activity(
+        CourseCode="ABC",
+        CourseName="C",
+        ActivityName="Lec",
+        StartTime="09:00:00",
+        EndTime="10:00:00",
+        Weeks=[
+            models.Week(WeekNumber=9, StartDate="2023-10-30"),
+            models.Week(WeekNumber=5, StartDate="2023-10-02"),
+            models.Week(WeekNumber=7, StartDate="2023-10-16"),
+            models.Week(WeekNumber=6, StartDate="2023-10-09"),
+        ],
+        ScheduledDay=2,
+        EndDate="2023-10-25",
+    )
+    tz = parse_timezone("Europe/London")
+    events = ics_builder.build_events([activity], tz=tz, start=date(2023, 10, 5))
+    assert len(events) == 1
+    assert events[0]["start"].date() == date(2023, 10, 11)
+    assert "UNTIL=20231018T080000Z" in events[0]["rrule"]
+    assert events[0]["exdates"] == []
+
+
+SEMESTERS = [
+    {"Code": "S1", "StartDate": "2023-09-06", "EndDate": "2023-12-15"},
+    {"Code": "S2", "StartDate": "2024-01-08T00:00:00", "EndDate": "2024-04-26"},
+]
+
+
+def test_bitstring_and_list_weeks_give_the_same_event():
+    table = weeks.WeekTable.from_semesters(SEMESTERS)
+    assert table.week_one("S1") == date(2023, 9, 4)  # Monday of the first week
+    listed, bits = models.parse_activities(
+        json.dumps(
+            [
+                {
+                    "CourseCode": "ABC",
+                    "CourseName": "C",
+                    "ActivityName": "Lec",
+                    "SemesterCode": "S2",
+                    "StartTime": "09:00:00",
+                    "EndTime": "10:00:00",
+                    "ScheduledDay": 2,
+                    "Weeks": [
+                        {"StartDate": f"2024-{d}"}
+                        for d in ("01-15", "01-22", "02-05", "02-19")
+                    ],
+                },
+                {
+                    "CourseCode": "ABC",
+                    "CourseName": "C",
+                    "ActivityName": "Lec",
+                    "SemesterCode": "S2",
+                    "StartTime": "09:00:00",
+                    "EndTime": "10:00:00",
+                    "ScheduledDay": 2,
+                    "Weeks": None,
+                    "RunningWeeks": "0 1101 01000",
+                },
+            ]
+        ).encode()
+    )
+    assert bits.RunningWeeks == [] and bits.RunningWeeksBitstring == "0 1101 01000"
+    tz = parse_timezone("Europe/London")
+    (from_list,) = ics_builder.build_events([listed], tz=tz)
+    (from_bits,) = ics_builder.build_events([bits], tz=tz, week_table=table)
+    assert from_bits == from_list
+    assert from_bits.start.date() == date(2024, 1, 17)
+    assert from_bits.weeks == 0b101011
+    # Without the semester table a bitstring cannot be placed in time.
+    assert ics_builder.build_events([bits], tz=tz) == []
+
+
+def test_week_mask_operations():
+    first = date(2023, 9, 4)
+    assert weeks.parse_bitstring("0110") == 0b0110
+    with pytest.raises(ValueError):
+        weeks.parse_bitstring("01x")
+    assert weeks.from_dates([date(2023, 9, 18), first, first]) == [(first, 0b101)]
+    assert weeks.clip(first, 0b11111, date(2023, 9, 12), date(2023, 9, 25)) == (
+        date(2023, 9, 18),
+        0b11,
+    )
+    assert weeks.clip(first, 0b1, None, date(2023, 9, 3)) == (first, 0)
+    later = (date(2023, 9, 25), 0b11)
+    assert weeks.merge((first, 0b1), later) == (first, 0b11001)
+    assert weeks.merge(later, (first, 0b1)) == (first, 0b11001)
+    assert weeks.gaps(0b11001) == 0b00110
+    assert list(weeks.iter_weeks(0b11001)) == [0, 3, 4]
+
+
+def test_invalid_bitstrings_fail_validation():
+    with pytest.raises(ValidationError):
+        models.Activity(
+            CourseCode="A",
+            CourseName="C",
+            StartTime="09:00:00",
+            EndTime="10:00:00",
+            Weeks="01y",
+        )
+
+
+@pytest.mark.parametrize("mode", ["weekly", "rrule"])
+def test_week_dates_off_the_weekly_lattice_keep_their_own_day(mode):
+    # The 2023-09-12 occurrence moved to a Tuesday.
+    activity = models.Activity(
+        CourseCode="ABC",
+        CourseName="C",
+        ActivityName="Lec",
+        StartTime="09:00:00",
+        EndTime="10:00:00",
+        Weeks=[
+            models.Week(StartDate=day)
+            for day in ("2023-09-04", "2023-09-12", "2023-09-18")
+        ],
+    )
+    tz = parse_timezone("Europe/London")
+    events = ics_builder.build_events([activity], tz=tz, recurrence=mode)
+    assert [d for e in events for d in e.occurrences()] == [
+        date(2023, 9, 4),
+        date(2023, 9, 18),
+        date(2023, 9, 12),
+    ]
+    assert len({e.uid for e in events}) == 2